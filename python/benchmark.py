@@ -0,0 +1,216 @@
+"""
+Reproducible benchmark of the label inspection pipeline.
+
+The corpus is not part of the repository, and nothing installs it on the stations: the label images
+show customer part data. Gather a directory of raw label photos (full camera frames) from the line
+once. Master data comes from a JSON fixture next to the images (<corpus>/master_data.json), served by
+an in-memory SQLite stand-in so runs do not depend on SQL Server. Create the fixture once on a machine
+that can reach SQL Server:
+
+    python benchmark.py <corpus> --snapshot-master-data
+
+and keep the corpus directory (images + fixture) together, e.g. on the engineering share, so later
+runs compare against the same data:
+
+    python benchmark.py <corpus> -o after.json --baseline before.json
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import numpy as np
+import cv2
+
+import detector
+
+# Stages reported by the benchmark, in pipeline order (keys of the 'timings' dict of process_image).
+STAGES = [
+    'crop_detection_ms', 'field_detection_ms', 'proximity_ms', 'recognition_ocr_ms', 'global_ocr_ms',
+    'individual_ocr_ms', 'verification_ms', 'encode_ms', 'total_ms', 'per_label_ms',
+]
+
+# Relative p50 slowdown (vs. a baseline result file) that counts as a regression.
+REGRESSION_THRESHOLD = 0.10
+
+
+# --- STAND-IN MASTER DATA (SQLITE) ---
+def build_sqlite_master_data(fixture):
+    """
+    Build a MasterDataStore served from an in-memory SQLite database with the same columns as
+    QUERY_INSIDE_LABEL/QUERY_OUTSIDE_LABEL, filled from a fixture {"inside": [rows], "outside": [rows]}.
+    """
+    uri = f"file:masterdata_{os.getpid()}?mode=memory&cache=shared"
+    connect = lambda conn_str: sqlite3.connect(conn_str, uri=True, check_same_thread=False)
+    keeper = connect(uri)  # The shared in-memory database lives as long as one connection is open
+
+    queries = {}
+    for label_type, (sql_query, _) in detector.LABEL_QUERIES.items():
+        table = f"{label_type}_label"
+        columns = detector.query_columns(sql_query)
+        keeper.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        rows = fixture.get(label_type, [])
+        keeper.executemany(
+            f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(row.get(column) for column in columns) for row in rows],
+        )
+        queries[label_type] = (f"SELECT * FROM {table} WHERE Partcode = ?", f"SELECT * FROM {table}")
+    keeper.commit()
+
+    store = detector.MasterDataStore(uri, queries=queries, connect=connect)
+    store.keeper = keeper
+    return store
+
+def snapshot_master_data(path):
+    """Dump all active template rows from the live SQL Server into a fixture file for the stand-in."""
+    fixture = {}
+    for label_type, (_, bulk_query) in detector.LABEL_QUERIES.items():
+        colnames, rows = detector.MASTER_DATA._query(bulk_query)
+        fixture[label_type] = [dict(zip(colnames, row)) for row in rows]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, default=str, indent=1)
+    return {label_type: len(rows) for label_type, rows in fixture.items()}
+
+
+# --- BENCHMARK ---
+def summarize(samples):
+    if not samples:
+        return None
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "count": len(values),
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+def run_benchmark(image_paths, repeat=3, warmup=1, detection_mode=None, ocr_mode=None, label_mode=None):
+    label_detector = detector.LabelDetector()
+    frames = [(path, cv2.imread(path)) for path in image_paths]
+    frames = [(path, frame) for path, frame in frames if frame is not None]
+    if not frames:
+        raise SystemExit("No readable images in the corpus")
+
+    for _ in range(warmup):
+        label_detector.process_image(detection_mode, ocr_mode, frame=frames[0][1], label_mode=label_mode)
+
+    samples = {stage: [] for stage in STAGES}
+    statuses = {}
+    labels = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path, frame in frames:
+            result = label_detector.process_image(detection_mode, ocr_mode, frame=frame, label_mode=label_mode)
+            status = result.get("status", "FAILED") if result.get("success") else "FAILED"
+            statuses[status] = statuses.get(status, 0) + 1
+            labels += result.get("label_count", 1)
+            timings = result.get("timings", {})
+            # In 'single' label mode the whole inspection is the cost of its one label
+            timings.setdefault('per_label_ms', timings.get('total_ms', 0.0))
+            for stage in STAGES:
+                # Stages that did not run (e.g. no fallback OCR) count as 0 ms
+                samples[stage].append(timings.get(stage, 0.0))
+    elapsed = time.perf_counter() - start
+    inspections = repeat * len(frames)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "detector_backend": detector.DETECTOR_BACKEND,
+            "detector_imgsz": detector.DETECTOR_IMGSZ,
+            "detector_int8": detector.DETECTOR_INT8,
+            "detection_mode": detection_mode or detector.DETECTION_MODE,
+            "ocr_mode": ocr_mode or detector.OCR_MODE,
+            "label_mode": label_mode or detector.LABEL_MODE,
+            "ocr_cache": detector.OCR_CACHE.enabled,
+            "roi_tracking": detector.ROI_TRACKER.enabled,
+            "images": len(frames),
+            "repeat": repeat,
+        },
+        "throughput": {
+            "inspections": inspections,
+            "elapsed_s": round(elapsed, 2),
+            "inspections_per_s": round(inspections / elapsed, 3),
+            "labels": labels,
+            "labels_per_s": round(labels / elapsed, 3),
+        },
+        "statuses": statuses,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "master_data_cache": detector.MASTER_DATA.stats(),
+        "roi_tracker": detector.ROI_TRACKER.stats(),
+    }
+
+def compare_with_baseline(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return the stages whose p50 got slower than the baseline by more than threshold."""
+    regressions = []
+    for stage in STAGES:
+        current, previous = report["stages"].get(stage), baseline.get("stages", {}).get(stage)
+        if not current or not previous or not previous["p50"]:
+            continue
+        change = (current["p50"] - previous["p50"]) / previous["p50"]
+        print(f"  {stage:<22} p50 {previous['p50']:>9.1f} -> {current['p50']:>9.1f} ms ({change:+.1%})")
+        if change > threshold:
+            regressions.append(stage)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the label inspection pipeline")
+    parser.add_argument("corpus", help="Directory of sample label images")
+    parser.add_argument("--master-data", help="Fixture JSON for the SQLite stand-in (default: <corpus>/master_data.json)")
+    parser.add_argument("--snapshot-master-data", action="store_true",
+                        help="Write the fixture from the live SQL Server, then exit")
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous result JSON to check for regressions")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--detection-mode", choices=["single", "two_pass"], default=None)
+    parser.add_argument("--ocr-mode", choices=["global", "recognition"], default=None)
+    parser.add_argument("--label-mode", choices=["single", "multi"], default=None)
+    parser.add_argument("--ocr-cache", action="store_true",
+                        help="Keep the OCR result cache on (off by default so repeats measure real OCR)")
+    parser.add_argument("--no-roi-tracking", action="store_true",
+                        help="Always localize the label in the full frame")
+    args = parser.parse_args(argv)
+    detector.OCR_CACHE.enabled = args.ocr_cache
+    detector.ROI_TRACKER.enabled = not args.no_roi_tracking
+
+    fixture_path = args.master_data or os.path.join(args.corpus, "master_data.json")
+    if args.snapshot_master_data:
+        print(json.dumps(snapshot_master_data(fixture_path)))
+        return 0
+
+    if not os.path.exists(fixture_path):
+        raise SystemExit(f"Master data fixture not found: {fixture_path}\n"
+                         f"Create it with: python benchmark.py {args.corpus} --snapshot-master-data")
+    with open(fixture_path, encoding="utf-8") as f:
+        detector.MASTER_DATA = build_sqlite_master_data(json.load(f))
+
+    report = run_benchmark(detector.list_images(args.corpus), args.repeat, args.warmup,
+                           args.detection_mode, args.ocr_mode, args.label_mode)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["stages"], indent=2))
+    print(f"Throughput: {report['throughput']['inspections_per_s']} inspections/s, "
+          f"{report['throughput']['labels_per_s']} labels/s")
+    if report["roi_tracker"]["enabled"]:
+        print(f"ROI tracker: hit rate {report['roi_tracker']['hit_rate']:.0%}, "
+              f"{report['roi_tracker']['time_saved_ms']} ms saved")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline}:")
+        regressions = compare_with_baseline(report, baseline)
+        if regressions:
+            print(f"Regression (> {REGRESSION_THRESHOLD:.0%} slower p50): {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,45 @@
 import os
+import re
+import glob
+import importlib
+import json
 import cv2
-import pyodbc
 import numpy as np
 import base64
+import queue
+import uuid
+import hashlib
 import threading
+import atexit
+import multiprocessing
 import time
-from flask import Flask, request, jsonify
+import shutil
+import socket
+import sqlite3
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from rapidocr_onnxruntime import RapidOCR
-from ultralytics import YOLO
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access (or by load())."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# Only Flask, OpenCV and NumPy load with the module so the server binds at once; the SQL driver, the
+# detector framework and RapidOCR load in the background startup stage (see warm_up).
+pyodbc = LazyModule("pyodbc")
 
 # --- KONFIGURASI ---
 
@@ -21,11 +52,142 @@ SQL_SERVER_CONN_STR = (
     "PWD=gapura;"
 )
 
-# List of class names that are logos and should be verified by presence, not OCR content.
-LOGO_CLASSES = [
-    'PML_JISFlag', 'PML_ULMark', 'PML_CU', 'PartBOM_URMark',
-    'PartBOM_LogoSA', 'PartBOM_FactoryCode'
-]
+# Master data pool & cache settings.
+SQL_POOL_SIZE = 4               # Maximum number of open SQL Server connections.
+SQL_POOL_TIMEOUT = 10           # Seconds to wait for a free pooled connection.
+MASTER_DATA_CACHE_SIZE = 1024   # Maximum number of cached (partcode, label_type) rows.
+MASTER_DATA_CACHE_TTL = 600     # Seconds before a cached row is re-read from the database.
+MASTER_DATA_PREFETCH = False    # Bulk-load all active partcodes into the cache at startup.
+MASTER_DATA_PREFETCH_REFRESH = 300  # Seconds between background reloads of the prefetch (keep below the TTL).
+
+# YOLO detection mode for /api/process:
+#   'two_pass' - run the detector again on the cropped label (original behavior).
+#   'single'   - reuse the field detections of the full-frame pass (one detector pass per inspection).
+#                Fields are then found on the downscaled full frame, not the label crop, so this stays
+#                opt-in (?detection_mode=single) until benchmark.py shows identical statuses on the corpus.
+DETECTION_MODE = 'two_pass'
+
+# OCR strategy for field text:
+#   'global'      - full-image RapidOCR detection+recognition, plus per-box OCR for adjacent boxes (original).
+#   'recognition' - recognition-only, batched over the YOLO field crops; low-confidence fields fall back
+#                   to the 'global' strategy. Opt-in (?ocr_mode=recognition) until benchmark.py shows
+#                   matching statuses and lower latency on the station corpus.
+OCR_MODE = 'global'
+OCR_REC_MIN_SCORE = 0.8   # Minimum recognition score before a field falls back to detection.
+OCR_REC_PADDING = 4       # Pixels of context added around each field crop.
+OCR_REC_HEIGHT = 48       # Crops are resized to the recognizer's input height.
+
+# Labels inspected per frame:
+#   'single' - the most confident 'inside' label, else the 'outside' one (original behavior).
+#   'multi'  - every 'inside'/'outside' label in view (a tray of bags); field detection ('two_pass'),
+#              recognition OCR and the master data lookup each run once for all labels.
+LABEL_MODE = 'single'
+LABEL_MIN_CONF = 0.5      # Minimum detector confidence for a label in 'multi' mode.
+LABEL_MAX_COUNT = 16      # At most this many labels per frame (the most confident ones).
+LABEL_OVERLAP_IOU = 0.5   # Label boxes overlapping more than this are the same label.
+
+# Content-addressed OCR result cache (repeated or unchanged label regions skip recognition).
+OCR_CACHE_ENABLED = True
+OCR_CACHE_MAX_MB = 64     # Memory budget for cached OCR results (LRU eviction).
+# 'exact'      - digest of the crop pixels; only byte-identical crops hit.
+# 'perceptual' - a cached crop also hits when its blurred, downscaled grayscale thumbnail differs from
+#                the new one by at most OCR_CACHE_PERCEPTUAL_MAX_DIFF grey levels at every pixel. Sensor
+#                noise stays within a few levels while a changed character differs by 100+ at its strokes.
+OCR_CACHE_KEY = 'exact'
+OCR_CACHE_PERCEPTUAL_HEIGHT = 32
+OCR_CACHE_PERCEPTUAL_MAX_DIFF = 24
+OCR_CACHE_PERCEPTUAL_SCAN = 64   # Most recent same-size thumbnails compared per lookup.
+
+# Cameras served by this station: name -> {"index": device index or None to probe, "backend": OpenCV
+# capture API ('ANY', 'DSHOW', 'MSMF', 'V4L2', ...) or None to probe}. The first camera is the default one
+# behind the unscoped /api/camera/* and /api/process routes; the others use /api/cameras/<name>/...
+CAMERAS = {
+    "default": {"index": None, "backend": None},
+}
+CAMERA_PROBE_INDICES = range(10)
+CAMERA_PROBE_BACKENDS = ['ANY']   # Tried in order per index, e.g. ['DSHOW', 'MSMF'] on Windows.
+CAMERA_WIDTH = 1920
+CAMERA_HEIGHT = 1080
+# Working device index/backend per camera name, reused on the next start before probing again.
+CAMERA_CACHE_FILE = os.path.join(os.path.expanduser("~"), "LabelDefectDetection", "cameras.json")
+
+# Annotated result images are drawn and JPEG-encoded only when requested: GET
+# /api/inspections/<id>/image (binary, cacheable) or ?image=base64 on /api/process. The crops of the last
+# ANNOTATION_CACHE_SIZE inspections are kept in memory for that.
+ANNOTATION_JPEG_QUALITY = 95
+ANNOTATION_SCALE = 1.0          # Default downscale factor of the rendered image (0-1].
+ANNOTATION_CACHE_SIZE = 32
+RESPONSE_IMAGE = 'base64'       # Default for /api/process?image=: 'base64' embeds the JPEG, 'url' only links it.
+RESPONSE_BOXES = False          # Include raw box geometry ('annotation') in /api/process responses by default.
+
+# ROI tracking: localize the label in a padded region around the last inside/outside box (per camera)
+# instead of the whole frame, and fall back to a full-frame search when it is not found there.
+ROI_TRACKING = True
+ROI_PADDING = 0.25        # Added on each side of the last box, as a fraction of its width/height.
+ROI_IMGSZ = 480           # Detector input size for the ROI pass ('pytorch' backend; exported models keep theirs).
+ROI_MAX_AREA = 0.6        # Regions larger than this fraction of the frame are searched as a full frame.
+ROI_EDGE_MARGIN = 4       # A label box this close to an inner ROI border may be cut off -> full-frame search.
+
+# Live preview settings. Frames are only JPEG-encoded when a client asks for them.
+PREVIEW_WIDTH = 960           # Preview frames are downscaled to this width (0 = full resolution).
+PREVIEW_JPEG_QUALITY = 80
+STREAM_MAX_FPS = 15           # Upper bound for the MJPEG stream at /api/camera/stream.
+
+# Asynchronous inspection jobs (/api/jobs).
+JOB_QUEUE_DEPTH = 4           # Maximum number of queued (not yet running) inspections per camera.
+JOB_QUEUE_POLICY = 'reject'   # When full: 'reject' the new job or 'drop_oldest' queued job.
+JOB_WORKERS = 1               # Inspection worker threads.
+JOB_HISTORY_SIZE = 100        # Finished jobs kept for polling.
+JOB_MAX_WAIT = 30             # Upper bound (seconds) for long-polling a job result.
+JOB_SYNC_TIMEOUT = 60         # Seconds /api/process waits for its inspection before answering 504.
+
+# Inference worker processes for the server. 0 runs inspections in the server process, one at a time.
+# N > 0 starts N processes, each with its own detector backend and RapidOCR engine; frames reach them
+# through shared-memory slots. On an 8-core station, 4 workers x 2 threads is a good starting point.
+INFERENCE_PROCESSES = 0
+INFERENCE_SLOTS_PER_WORKER = 2    # Extra slots let the next frame be copied in while all workers are busy.
+INFERENCE_SLOT_MB = 8             # One slot holds a frame up to this size (1920x1080 BGR is ~6 MB).
+
+# Continuous mode: inspect automatically once a label has settled in front of the camera.
+AUTO_INSPECT = False          # Enable continuous mode at startup (can be toggled via /api/auto).
+AUTO_MOTION_WIDTH = 160       # Width of the grayscale thumbnail used for frame differencing.
+AUTO_MOTION_THRESHOLD = 4.0   # Mean absolute pixel difference (0-255) that counts as motion.
+AUTO_STABLE_FRAMES = 8        # Consecutive still frames required before an inspection is triggered.
+
+# Local inspection result store (SQLite in WAL mode, written by a background thread; API server only).
+RESULT_STORE_ENABLED = True
+RESULT_STORE_DIR = os.path.join(os.path.expanduser("~"), "LabelDefectDetection", "results")
+RESULT_QUEUE_SIZE = 1000          # Pending records; when full, new records are dropped (never blocks inspection).
+RESULT_BATCH_SIZE = 50            # Records per SQLite transaction.
+RESULT_FLUSH_INTERVAL = 2.0       # Seconds before a partial batch is committed.
+RESULT_RETENTION_DAYS = 30        # Rows and annotated images older than this are removed.
+RESULT_MAX_IMAGE_MB = 2048        # Oldest image days are removed beyond this size.
+RESULT_SAVE_IMAGES = False        # Also store the annotated JPEG (rendered for every inspection when on).
+# Optional batched upload of stored results to SQL Server. The table is not created by the application;
+# see "Result upload" in README.md for its DDL.
+RESULT_UPLOAD_ENABLED = False
+RESULT_UPLOAD_BATCH_SIZE = 200
+RESULT_UPLOAD_INTERVAL = 30       # Seconds between upload attempts (doubles on failure, up to 30 minutes).
+RESULT_UPLOAD_QUERY = """
+INSERT INTO T_LabelInspectionResult
+    (InspectionId, StationName, InspectedAt, Source, Partcode, LabelType, Status, MatchedJson, DefectsJson, TimingsJson, ImagePath)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Include the per-stage timing breakdown in /api/process responses (override with ?timings=0/1).
+RESPONSE_TIMINGS = True
+
+# YOLO inference backend:
+#   'pytorch'     - ultralytics with models/best.pt (original).
+#   'onnxruntime' - best.pt exported to ONNX, run with ONNX Runtime on CPU.
+#   'openvino'    - the same ONNX file compiled by OpenVINO for the CPU (needs the 'openvino' package).
+DETECTOR_BACKEND = 'pytorch'
+DETECTOR_IMGSZ = None         # Inference input size (square); None = the size best.pt was trained at.
+DETECTOR_THREADS = 0          # Intra-op CPU threads for inference (0 = library default).
+DETECTOR_INT8 = False         # Use the INT8-quantized ONNX model (onnxruntime/openvino backends).
+DETECTOR_CONF = 0.25          # Confidence threshold (same default as ultralytics).
+DETECTOR_IOU = 0.7            # NMS IoU threshold (same default as ultralytics).
+DETECTOR_MAX_DET = 300
 
 # --- KUMPULAN QUERY SQL ---
 QUERY_INSIDE_LABEL = """
@@ -68,6 +230,15 @@ INNER JOIN M_RoHSType AS d WITH (NOLOCK) ON d.R_Code = b.Partbom_Leadfreestatus
 WHERE a.Partbom_Partcode = ?
 """
 
+# Bulk variants (no partcode filter) used to prefetch all active partcodes into the cache.
+QUERY_INSIDE_LABEL_ALL = QUERY_INSIDE_LABEL.rsplit("WHERE", 1)[0]
+QUERY_OUTSIDE_LABEL_ALL = QUERY_OUTSIDE_LABEL.rsplit("WHERE", 1)[0]
+
+LABEL_QUERIES = {
+    'inside': (QUERY_INSIDE_LABEL, QUERY_INSIDE_LABEL_ALL),
+    'outside': (QUERY_OUTSIDE_LABEL, QUERY_OUTSIDE_LABEL_ALL),
+}
+
 # --- Inisialisasi & Konfigurasi Path ---
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Get the directory where this script is located.
@@ -92,42 +263,106 @@ else:
     print(f"Error: Model not found in Dev or Prod paths. Failing.")
     MODEL_PATH = prod_model_path
 
-OCR_ENGINE = RapidOCR()
-
-SQL_ALIAS_TO_YOLO_CLASS = {
-    'Partcode': 'Partbom_Partcode', 'PartName': 'PML_CustomerSubPartName', 'CatNo': 'CatNo',
-    'BoxQty': 'PartBOM_BoxQty', 'RType': 'R_Type', 'CompanyName': 'PartBOM_CompanyName',
-    'CountryMfg': 'PartBOM_RemarkOnProduct', 'FactoryCode': 'PartBOM_FactoryCode',
-    'Voltage': 'PartBOM_Voltage', 'CurrentRating': 'PartBOM_Current', 'Applicable': 'PartBOM_Applicable',
-    'UseInCrimp': 'PartBOM_UseInCrimp', 'StripLength': 'PartBOM_StripLength', 'JISFlag': 'PML_JISFlag',
-    'CompanyPlant': 'CompanyPlant', 'WireSize': 'PartBOM_WireSize', 'ToolDies1': 'PartBOM_ToolDies1',
-    'ToolDies2': 'PartBOM_ToolDies2', 'ToolDies3': 'PartBOM_ToolDies3', 'ToolDies4': 'PartBOM_ToolDies4',
-    'TrayRemark': 'PartBOM_TrayRemark', 'ULMark': 'PML_ULMark', 'ULType': 'PartBOM_ULType',
-    'PrintingWith': 'MUL_PrintingWith', 'CUMark': 'PML_CU', 'URMark': 'PartBOM_URMark',
-    'RemarkType': 'PartBOM_RemarkType', 'Remark': 'partBOM_Remark', 'CSAMark': 'PartBOM_LogoSA',
-    'CSARemark': 'PartBOM_CSARemark', 'Color': 'PartBOM_Color', 'WireStripLength': 'PartBOM_WireStripLen'
-}
+# Label images used to calibrate INT8 quantization of the exported ONNX model.
+CALIBRATION_DIR = os.path.join(os.path.dirname(MODEL_PATH), "calibration")
 
-# --- FUNGSI HELPER ---
-def clean_text_for_comparison(text: str) -> str:
-    """Clean and standardize text for comparison by removing spaces and making it lowercase."""
-    if text is None: return ""
-    # Added full-width parentheses and other special chars
-    return (
-        str(text)
-        .lower()
-        .replace(" ", "")
-        .replace("-", "")
-        .replace(".", "")
-        .replace(",", "")
-        .replace("（", "")
-        .replace("）", "")
-        .replace("(", "")
-        .replace(")", "")
-        .replace(":", "")
-        .replace("/", "")
-    )
+_ocr_engine = None
+_ocr_engine_lock = threading.Lock()
+
+def get_ocr_engine():
+    """The shared RapidOCR engine, created on first use (normally by the startup warm-up)."""
+    global _ocr_engine
+    with _ocr_engine_lock:
+        if _ocr_engine is None:
+            from rapidocr_onnxruntime import RapidOCR
+            _ocr_engine = RapidOCR()
+        return _ocr_engine
+
+# Declarative per-class field rules (SQL alias, logo flag, OCR cleanup, comparison normalization),
+# compiled once at startup by FieldRules.
+FIELD_RULES_PATH = os.path.join(SCRIPT_DIR, "field_rules.json")
+
+def query_columns(sql_query):
+    """Column aliases produced by one of the SQL Server label queries, in SELECT order."""
+    select_part = sql_query.split("FROM", 1)[0]
+    return re.findall(r"\bAS\s+(\w+)\s*(?=,|\n)", select_part)
 
+
+class FieldRule:
+    """Compiled rule for one YOLO field class."""
+
+    def __init__(self, yolo_class, config, compare_defaults):
+        self.yolo_class = yolo_class
+        self.sql_alias = config["sql_alias"]
+        self.logo = bool(config.get("logo", False))
+        # OCR cleanup: ordered regex substitutions, e.g. keep only the text after 'Voltage:'
+        self.ocr_steps = [
+            (re.compile(step["pattern"]), step.get("replace", ""), step.get("count", 0))
+            for step in config.get("ocr", [])
+        ]
+        compare = dict(compare_defaults, **config.get("compare", {}))
+        self.lowercase = compare.get("lowercase", True)
+        remove_chars = compare.get("remove_chars", "")
+        self.delete_table = str.maketrans("", "", remove_chars)
+        # bytes.translate is several times faster than str.translate for the usual all-ASCII values
+        self.delete_ascii = "".join(char for char in remove_chars if char.isascii()).encode("ascii")
+        self.lstrip_chars = compare.get("lstrip")
+
+    def clean_ocr(self, text):
+        if not self.ocr_steps:
+            return text
+        for pattern, replacement, count in self.ocr_steps:
+            text = pattern.sub(replacement, text, count=count)
+        return text.strip()
+
+    def normalize(self, value):
+        """Canonical form used to compare the master data value with the OCR text."""
+        if value is None: return ""
+        text = str(value)
+        if self.lowercase:
+            text = text.lower()
+        if text.isascii():
+            text = text.encode("ascii").translate(None, self.delete_ascii).decode("ascii")
+        else:
+            text = text.translate(self.delete_table)
+        if self.lstrip_chars:
+            text = text.lstrip(self.lstrip_chars)
+        return text
+
+
+class FieldRules:
+    """
+    The field rule table: rules by (lower-cased) YOLO class, the logo classes, and per label type
+    only the rules whose SQL alias is selected by that label type's query.
+    """
+
+    def __init__(self, config, label_queries=LABEL_QUERIES):
+        compare_defaults = config.get("compare", {})
+        self.rules = [FieldRule(yolo_class, field, compare_defaults) for yolo_class, field in config["fields"].items()]
+        self._by_class = {rule.yolo_class.lower(): rule for rule in self.rules}
+        self.logo_classes = frozenset(rule.yolo_class for rule in self.rules if rule.logo)
+        self.by_label_type = {}
+        for label_type, (sql_query, _) in label_queries.items():
+            columns = set(query_columns(sql_query))
+            self.by_label_type[label_type] = [rule for rule in self.rules if rule.sql_alias in columns]
+
+    @classmethod
+    def load(cls, path=FIELD_RULES_PATH, label_queries=LABEL_QUERIES):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), label_queries)
+
+    def get(self, class_name):
+        return self._by_class.get(class_name.lower())
+
+    def for_label_type(self, label_type):
+        return self.by_label_type.get(label_type, self.rules)
+
+
+FIELD_RULES = FieldRules.load()
+# Presence-only classes: detected by YOLO, never read by OCR
+LOGO_CLASSES = FIELD_RULES.logo_classes
+
+# --- FUNGSI HELPER ---
 def get_box_center(box_coords):
     x1, y1, x2, y2 = map(int, box_coords)
     return (x1 + x2) // 2, (y1 + y2) // 2
@@ -142,45 +377,845 @@ def is_point_inside_box(point, box_coords):
     return x1 <= px <= x2 and y1 <= py <= y2
 
 
+class BoxStore:
+    """
+    NumPy-backed store of xyxy boxes for vectorized geometry queries.
+
+    Mirrors the scalar helpers above exactly (same float arithmetic for proximity, same
+    int truncation and floor division as get_box_center/is_point_inside_box for containment).
+    """
+
+    def __init__(self, coords):
+        self.xyxy = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def adjacent_pairs(self):
+        """
+        Return (i, j) index pairs, i < j, of boxes that sit on the same row and touch horizontally:
+        |cy_a - cy_b| < avg_height * 0.5 and horizontal_gap < avg_width * 0.5.
+        """
+        x1, y1, x2, y2 = self.xyxy.T
+        cy = (y1 + y2) / 2
+        heights = y2 - y1
+        widths = x2 - x1
+
+        avg_height = (heights[:, None] + heights[None, :]) / 2
+        same_row = np.abs(cy[:, None] - cy[None, :]) < avg_height * 0.5
+
+        horizontal_gap = np.maximum(x1[:, None], x1[None, :]) - np.minimum(x2[:, None], x2[None, :])
+        avg_width = (widths[:, None] + widths[None, :]) / 2
+        touching = horizontal_gap < avg_width * 0.5
+
+        return np.argwhere(np.triu(same_row & touching, k=1))
+
+    def assign_centers(self, other_coords):
+        """
+        For every box in this store, return the indices (in their original order) of the boxes
+        in other_coords whose center lies inside it.
+        """
+        other = np.trunc(np.asarray(other_coords, dtype=np.float64).reshape(-1, 4)).astype(np.int64)
+        cx = (other[:, 0] + other[:, 2]) // 2
+        cy = (other[:, 1] + other[:, 3]) // 2
+
+        bx1, by1, bx2, by2 = np.trunc(self.xyxy).astype(np.int64).T
+        inside = (
+            (bx1[:, None] <= cx[None, :]) & (cx[None, :] <= bx2[:, None]) &
+            (by1[:, None] <= cy[None, :]) & (cy[None, :] <= by2[:, None])
+        )
+        return [np.flatnonzero(row) for row in inside]
+
+
+# --- METRIK (PROMETHEUS) ---
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape_label_value(value):
+    # Text exposition format: backslash, double quote and line feed are escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, remote=()):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        values = self.snapshot()
+        for snapshot in remote:
+            for key, value in snapshot.items():
+                values[key] = values.get(key, 0) + value
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self, remote=()):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        all_series = self.snapshot()
+        for snapshot in remote:
+            for key, series in snapshot.items():
+                merged = all_series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+                all_series[key] = [a + b for a, b in zip(merged, series)]
+        for key, series in sorted(all_series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _format_labels(self.label_names, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.label_names, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value(s) are read from a callback at scrape time; the callback returns a number
+    or a dict mapping a label value to a number."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name, help_text, callback, label_name=None):
+        self.name, self.help_text, self.callback, self.label_name = name, help_text, callback, label_name
+
+    def render(self, remote=()):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        value = self.callback()
+        if isinstance(value, dict):
+            for label_value, v in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels((self.label_name,), (label_value,))} {v}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class CallbackCounter(Gauge):
+    """Counter read from a callback at scrape time, for totals another object already keeps (e.g. cache hits)."""
+
+    metric_type = "counter"
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, plus the last counter/histogram snapshots reported by other processes
+    (inference workers), which are added in at render time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._remote = {}  # source -> {metric name: snapshot}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics if hasattr(metric, "snapshot")}
+
+    def set_remote(self, source, snapshot):
+        """Record the cumulative metrics of another process (replaces its previous snapshot)."""
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def render(self):
+        with self._lock:
+            remote = list(self._remote.values())
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render([snapshot[metric.name] for snapshot in remote if metric.name in snapshot]))
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+INSPECTION_STAGE_SECONDS = METRICS.register(Histogram(
+    "label_inspection_stage_seconds", "Duration of each inspection pipeline stage.", ("stage",)))
+INSPECTIONS_TOTAL = METRICS.register(Counter(
+    "label_inspections_total", "Inspections by result status.", ("status",)))
+CAMERA_FRAMES_TOTAL = METRICS.register(Counter(
+    "camera_frames_total", "Frames captured by the camera threads.", ("camera",)))
+CAMERA_FRAMES_DROPPED_TOTAL = METRICS.register(Counter(
+    "camera_frames_dropped_total", "Failed camera reads in the capture threads.", ("camera",)))
+PREVIEW_ENCODE_SECONDS = METRICS.register(Histogram(
+    "camera_preview_encode_seconds", "Time to downscale and JPEG-encode a preview frame."))
+SQL_QUERY_SECONDS = METRICS.register(Histogram(
+    "master_data_query_seconds", "SQL Server master data query latency.", ("outcome",)))
+RESULT_RECORDS_TOTAL = METRICS.register(Counter(
+    "result_store_records_total", "Inspection records handled by the result store.", ("outcome",)))
+ROI_TRACKER_TOTAL = METRICS.register(Counter(
+    "label_roi_tracker_total", "Label localizations by ROI tracker outcome.", ("outcome",)))
+MASTER_DATA_CACHE_LOOKUP_SECONDS = METRICS.register(Histogram(
+    "master_data_cache_lookup_seconds", "Master data cache lookup latency.", ("result",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005)))
+
+
+# Per-process settings and averages in component stats; everything else numeric is a count that adds up
+_UNSUMMED_STATS = {"max_entries", "ttl_seconds", "max_bytes", "hit_rate", "full_frame_avg_ms"}
+
+def merge_stats(stats_list):
+    """Combine the stats() of the same component (OCR cache, ROI tracker, master data cache) from several processes."""
+    merged = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            summable = isinstance(value, (int, float)) and not isinstance(value, bool) and key not in _UNSUMMED_STATS
+            if summable and key in merged:
+                merged[key] = round(merged[key] + value, 1) if isinstance(value, float) else merged[key] + value
+            else:
+                merged.setdefault(key, value)
+    if "hit_rate" in merged:
+        attempts = merged["hits"] + merged.get("misses", merged.get("fallbacks", 0))
+        merged["hit_rate"] = round(merged["hits"] / attempts, 4) if attempts else 0.0
+    return merged
+
+
+# --- MASTER DATA (CONNECTION POOL & CACHE) ---
+class SQLConnectionPool:
+    """Bounded pool of pyodbc connections that are reused across inspections."""
+
+    def __init__(self, conn_str, max_size=SQL_POOL_SIZE, timeout=SQL_POOL_TIMEOUT, connect=None):
+        self.conn_str = conn_str
+        self.timeout = timeout
+        self.connect = connect  # None: pyodbc.connect, resolved on first use
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; broken connections are closed instead of returned."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pyodbc.Error("HYT00", "Timed out waiting for a pooled SQL Server connection")
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = (self.connect or pyodbc.connect)(self.conn_str)
+            yield conn
+        except pyodbc.Error:
+            if conn is not None:
+                try:
+                    conn.close()
+                except pyodbc.Error:
+                    pass
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+
+
+class MasterDataCache:
+    """Thread-safe LRU cache with TTL expiry for template rows keyed by (partcode, label_type).
+
+    A value of None is cached too, so unknown partcodes do not hit the database on every retry.
+    """
+
+    def __init__(self, max_entries=MASTER_DATA_CACHE_SIZE, ttl=MASTER_DATA_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (found, value) for key, dropping the entry if it has expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, max_entries):
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, partcode=None, label_type=None):
+        """Drop matching entries (all entries when no filter is given) and return how many were removed."""
+        with self._lock:
+            if partcode is None and label_type is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            keys = [
+                key for key in self._entries
+                if (partcode is None or key[0] == partcode) and (label_type is None or key[1] == label_type)
+            ]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def in_list_query(query, count):
+    """Turn a single-partcode query ending in '= ?' into one matching count partcodes with IN (?, ...)."""
+    head, separator, tail = query.rstrip().rpartition("= ?")
+    if not separator or tail:
+        raise ValueError("Master data query must end with '= ?'")
+    return f"{head}IN ({', '.join('?' * count)})"
+
+def normalize_partcode(value) -> str:
+    """Partcodes are looked up without leading zeros, matching the OCR-side normalization."""
+    return str(value).strip().lstrip('0') if value is not None else ""
+
+def master_data_key(partcode, label_type):
+    """Cache key of a partcode's template: case-insensitive like SQL Server's default collation."""
+    return normalize_partcode(partcode).upper(), label_type
+
+
+class MasterDataStore:
+    """
+    Read-through access to the part master data backed by a connection pool and an LRU/TTL cache.
+
+    queries maps label_type to (single-partcode query, bulk query); connect creates a DB-API
+    connection from conn_str (pyodbc by default, e.g. sqlite3 for a local stand-in).
+    """
+
+    def __init__(self, conn_str, queries=None, connect=None):
+        self.queries = queries or LABEL_QUERIES
+        self.pool = SQLConnectionPool(conn_str, connect=connect)
+        self.cache = MasterDataCache()
+        self.generation = 0  # Bumped by invalidate() so inference worker processes follow
+
+    def _query(self, sql, *params):
+        # A pooled connection may have gone stale (server restart, network blip); retry once on a fresh one.
+        for attempt in range(2):
+            query_start = time.perf_counter()
+            try:
+                with self.pool.connection() as conn:
+                    cur = conn.cursor()
+                    if params:
+                        cur.execute(sql, params)
+                    else:
+                        cur.execute(sql)
+                    rows = cur.fetchall()
+                    colnames = [desc[0] for desc in cur.description]
+                SQL_QUERY_SECONDS.observe(time.perf_counter() - query_start, outcome="ok")
+                return colnames, rows
+            except pyodbc.Error:
+                SQL_QUERY_SECONDS.observe(time.perf_counter() - query_start, outcome="error")
+                if attempt:
+                    raise
+
+    def get_template(self, partcode, label_type):
+        """Return the template row for partcode as a dict, or None if the partcode is not in the database."""
+        key = master_data_key(partcode, label_type)
+        lookup_start = time.perf_counter()
+        found, template = self.cache.get(key)
+        MASTER_DATA_CACHE_LOOKUP_SECONDS.observe(time.perf_counter() - lookup_start, result="hit" if found else "miss")
+        if found:
+            return template
+
+        query, _ = self.queries[label_type]
+        # The database compares the partcode itself; only the cache key is case-folded
+        colnames, rows = self._query(query, normalize_partcode(partcode))
+        template = dict(zip(colnames, rows[0])) if rows else None
+        self.cache.put(key, template)
+        return template
+
+    def get_templates(self, keys):
+        """
+        Templates for several (partcode, label_type) keys at once: cache misses of a label type are read
+        in a single IN (...) query. Returns {master_data_key(partcode, label_type): template or None}; partcodes
+        the query returned no row for are left out, so callers fall back to get_template for them.
+        """
+        templates, missing = {}, {}
+        for partcode, label_type in keys:
+            key = master_data_key(partcode, label_type)
+            if key in templates or key[0] in missing.get(label_type, ()):
+                continue
+            lookup_start = time.perf_counter()
+            found, template = self.cache.get(key)
+            MASTER_DATA_CACHE_LOOKUP_SECONDS.observe(time.perf_counter() - lookup_start,
+                                                     result="hit" if found else "miss")
+            if found:
+                templates[key] = template
+            else:
+                missing.setdefault(label_type, {})[key[0]] = normalize_partcode(partcode)
+
+        for label_type, partcodes in missing.items():
+            query, _ = self.queries[label_type]
+            colnames, rows = self._query(in_list_query(query, len(partcodes)), *partcodes.values())
+            fetched = {}
+            for row in rows:
+                template = dict(zip(colnames, row))
+                # Match rows like SQL Server's default collation did: case-insensitive, trailing spaces ignored
+                fetched.setdefault(master_data_key(template.get('Partcode'), label_type), template)
+            for partcode in partcodes:
+                template = fetched.get((partcode, label_type))
+                if template is not None:
+                    templates[(partcode, label_type)] = template
+                    self.cache.put((partcode, label_type), template)
+        return templates
+
+    def prefetch(self, label_types=('inside', 'outside')):
+        """Bulk-load every active partcode for the given label types into the cache."""
+        templates = {}
+        for label_type in label_types:
+            _, bulk_query = self.queries[label_type]
+            colnames, rows = self._query(bulk_query)
+            for row in rows:
+                template = dict(zip(colnames, row))
+                key = master_data_key(template.get('Partcode'), label_type)
+                if key[0]:
+                    templates.setdefault(key, template)
+        # Grow the cache to hold the whole prefetch plus the usual room for on-demand lookups;
+        # otherwise the prefetch would evict its own entries
+        self.cache.resize(max(self.cache.max_entries, len(templates) + MASTER_DATA_CACHE_SIZE))
+        for key, template in templates.items():
+            self.cache.put(key, template)
+        print(f"Master data prefetch selesai: {len(templates)} partcode dimuat ke cache.")
+        return len(templates)
+
+    def start_prefetch(self, interval=MASTER_DATA_PREFETCH_REFRESH):
+        """
+        prefetch() now, then again every interval seconds in the background so the prefetched rows are
+        refreshed before their TTL runs out. Returns the number of rows of the first load.
+        """
+        count = self.prefetch()
+
+        def refresh():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.prefetch()
+                except pyodbc.Error as error:
+                    # Rows expire after the TTL and are then read on demand until the next refresh succeeds
+                    print(f"Peringatan: Refresh prefetch master data gagal: {error}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+        return count
+
+    def invalidate(self, partcode=None, label_type=None):
+        if partcode is not None:
+            partcode = master_data_key(partcode, label_type)[0]
+        self.generation += 1
+        return self.cache.invalidate(partcode, label_type)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+MASTER_DATA = MasterDataStore(SQL_SERVER_CONN_STR)
+
+
+# --- BACKEND DETEKTOR YOLO ---
+class Detections:
+    """Backend-independent detector output: class names plus xyxy/conf/cls arrays in image pixels."""
+
+    def __init__(self, names, xyxy, conf, cls):
+        self.names = names
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        """Yield (class_name, [x1, y1, x2, y2], confidence) per detection."""
+        for coords, confidence, class_id in zip(self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist()):
+            yield self.names.get(class_id, "Unknown"), coords, confidence
+
+    def translated(self, dx, dy):
+        """The same detections shifted by (dx, dy), e.g. from ROI to full-frame coordinates."""
+        return Detections(self.names, self.xyxy + np.array([dx, dy, dx, dy], dtype=np.float32), self.conf, self.cls)
+
+
+class UltralyticsBackend:
+    """Original PyTorch inference through ultralytics."""
+
+    name = 'pytorch'
+
+    def __init__(self, model_path=MODEL_PATH, imgsz=DETECTOR_IMGSZ, threads=DETECTOR_THREADS):
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def _options(self, imgsz):
+        options = {"conf": DETECTOR_CONF, "iou": DETECTOR_IOU, "max_det": DETECTOR_MAX_DET, "verbose": False}
+        # Without an explicit size ultralytics uses the training imgsz stored in the checkpoint
+        if imgsz or self.imgsz:
+            options["imgsz"] = imgsz or self.imgsz
+        return options
+
+    def predict(self, image, imgsz=None):
+        results = self.model(image, **self._options(imgsz))[0]
+        return self._detections(results)
+
+    def predict_batch(self, images, imgsz=None):
+        """One forward pass over several images (e.g. all label crops of a frame)."""
+        results = self.model(list(images), **self._options(imgsz))
+        return [self._detections(result) for result in results]
+
+    @staticmethod
+    def _detections(results):
+        boxes = results.boxes
+        return Detections(results.names, boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+
+def letterbox(image, imgsz):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz (ultralytics style); returns (blob, scale, pad)."""
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = round(w * scale), round(h * scale)
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+    padded = cv2.copyMakeBorder(resized, top, imgsz - new_h - top, left, imgsz - new_w - left,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    blob = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob), scale, (left, top)
+
+
+class ExportedModelBackend:
+    """Shared pre/post-processing for the exported (ONNX graph) YOLO model."""
+
+    def __init__(self, onnx_path):
+        with open(exported_metadata_path(onnx_path)) as f:
+            metadata = json.load(f)
+        self.names = {int(k): v for k, v in metadata['names'].items()}
+        self.imgsz = metadata['imgsz']
+
+    def _infer(self, blob):
+        raise NotImplementedError
+
+    def predict(self, image, imgsz=None):
+        # The exported graph has a fixed input size, so an imgsz override is ignored
+        blob, scale, (pad_x, pad_y) = letterbox(image, self.imgsz)
+        output = self._infer(blob)[0].T  # (num_anchors, 4 + num_classes)
+
+        class_scores = output[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+        keep = conf >= DETECTOR_CONF
+        boxes, conf, cls = output[keep, :4], conf[keep], cls[keep]
+
+        # cx, cy, w, h -> x1, y1, x2, y2 in original image pixels
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / scale).clip(0, image.shape[1])
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / scale).clip(0, image.shape[0])
+
+        # Per-class NMS: offset boxes by class id so different classes never overlap
+        offset = cls[:, None].astype(np.float32) * 7680
+        nms_boxes = xyxy + offset
+        nms_boxes[:, 2:] -= nms_boxes[:, :2]
+        keep = cv2.dnn.NMSBoxes(nms_boxes.tolist(), conf.tolist(), DETECTOR_CONF, DETECTOR_IOU)
+        keep = np.array(keep, dtype=np.int64).reshape(-1)
+        keep = keep[np.argsort(-conf[keep], kind='stable')][:DETECTOR_MAX_DET]
+        return Detections(self.names, xyxy[keep], conf[keep], cls[keep])
+
+    def predict_batch(self, images, imgsz=None):
+        # The graph is exported with a fixed batch size of 1
+        return [self.predict(image, imgsz) for image in images]
+
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    name = 'onnxruntime'
+
+    def __init__(self, onnx_path, threads=DETECTOR_THREADS):
+        super().__init__(onnx_path)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(ExportedModelBackend):
+    name = 'openvino'
+
+    def __init__(self, onnx_path, threads=DETECTOR_THREADS):
+        super().__init__(onnx_path)
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise RuntimeError("DETECTOR_BACKEND='openvino' requires the 'openvino' package") from e
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.compiled = ov.Core().compile_model(onnx_path, "CPU", config)
+
+    def _infer(self, blob):
+        return self.compiled(blob)[0]
+
+
+def exported_model_path(imgsz=DETECTOR_IMGSZ, int8=False, model_path=MODEL_PATH):
+    """best_<imgsz>[_int8].onnx, or best[_int8].onnx for an export at the model's training size."""
+    stem = os.path.splitext(model_path)[0]
+    return f"{stem}{f'_{imgsz}' if imgsz else ''}{'_int8' if int8 else ''}.onnx"
+
+def exported_metadata_path(onnx_path):
+    return os.path.splitext(onnx_path)[0] + ".json"
+
+def list_images(path):
+    """Return the sorted image files in a directory (or the file itself)."""
+    if os.path.isfile(path):
+        return [path]
+    patterns = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+    return sorted(f for pattern in patterns for f in glob.glob(os.path.join(path, pattern)))
+
+def export_detector_model(imgsz=DETECTOR_IMGSZ, int8=False, calibration_dir=CALIBRATION_DIR, model_path=MODEL_PATH):
+    """
+    Export best.pt to ONNX for the given input size (None = the size it was trained at), optionally followed
+    by static INT8 quantization calibrated on the label images in calibration_dir. Returns the path of the ONNX file.
+    """
+    fp32_path = exported_model_path(imgsz, False, model_path)
+    if not os.path.exists(fp32_path):
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        export_imgsz = imgsz or model.overrides.get('imgsz', 640)
+        print(f"Mengekspor model YOLO ke ONNX ({export_imgsz}x{export_imgsz})...")
+        exported = model.export(format='onnx', imgsz=export_imgsz, dynamic=False, simplify=True)
+        os.replace(exported, fp32_path)
+        with open(exported_metadata_path(fp32_path), "w") as f:
+            json.dump({"names": model.names, "imgsz": export_imgsz, "int8": False}, f)
+    if not int8:
+        return fp32_path
+
+    int8_path = exported_model_path(imgsz, True, model_path)
+    if os.path.exists(int8_path):
+        return int8_path
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    calibration_images = list_images(calibration_dir) if os.path.isdir(calibration_dir) else []
+    if not calibration_images:
+        raise RuntimeError(f"INT8 quantization needs calibration label images in {calibration_dir}")
+
+    class LabelCalibrationReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.paths = iter(calibration_images)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {self.input_name: letterbox(image, imgsz)[0]}
+            return None
+
+    import onnxruntime as ort
+    with open(exported_metadata_path(fp32_path)) as f:
+        metadata = json.load(f)
+    imgsz = metadata['imgsz']  # Calibration images are letterboxed to the exported input size
+    input_name = ort.InferenceSession(fp32_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    print(f"Kuantisasi INT8 dengan {len(calibration_images)} gambar kalibrasi...")
+    quantize_static(fp32_path, int8_path, LabelCalibrationReader(input_name),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    with open(exported_metadata_path(int8_path), "w") as f:
+        json.dump(dict(metadata, int8=True), f)
+    return int8_path
+
+def load_detector_backend(backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, threads=DETECTOR_THREADS, int8=DETECTOR_INT8):
+    """Create the configured detector backend, exporting the ONNX model on first use."""
+    if backend == 'pytorch':
+        return UltralyticsBackend(MODEL_PATH, imgsz, threads)
+    if backend not in ('onnxruntime', 'openvino'):
+        raise ValueError(f"Unknown detector backend: {backend}")
+    try:
+        onnx_path = export_detector_model(imgsz, int8)
+    except (RuntimeError, ImportError) as e:
+        # No calibration images, or the quantization tooling is missing: the FP32 model still works
+        if not int8:
+            raise
+        print(f"Peringatan: {e}. Memakai model ONNX FP32.")
+        onnx_path = export_detector_model(imgsz, False)
+    backend_cls = OnnxRuntimeBackend if backend == 'onnxruntime' else OpenVinoBackend
+    print(f"Memuat backend detektor '{backend}' dari {onnx_path}")
+    return backend_cls(onnx_path, threads)
+
+def box_iou(box_a, box_b):
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1]) + (box_b[2] - box_b[0]) * (box_b[3] - box_b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def compare_detector_backends(image_paths, candidate, reference, iou_threshold=0.5):
+    """
+    Accuracy and latency check of a candidate backend against the reference (.pt) backend.
+    Detections are matched greedily per class at IoU >= iou_threshold.
+    """
+    matched = ref_total = cand_total = 0
+    ious, conf_deltas = [], []
+    ref_time = cand_time = 0.0
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        start = time.perf_counter()
+        ref_dets = list(reference.predict(image))
+        ref_time += time.perf_counter() - start
+        start = time.perf_counter()
+        cand_dets = list(candidate.predict(image))
+        cand_time += time.perf_counter() - start
+
+        ref_total += len(ref_dets)
+        cand_total += len(cand_dets)
+        unused = list(cand_dets)
+        for ref_name, ref_coords, ref_conf in sorted(ref_dets, key=lambda d: -d[2]):
+            best, best_iou = None, iou_threshold
+            for det in unused:
+                if det[0] == ref_name:
+                    iou = box_iou(ref_coords, det[1])
+                    if iou >= best_iou:
+                        best, best_iou = det, iou
+            if best is not None:
+                unused.remove(best)
+                matched += 1
+                ious.append(best_iou)
+                conf_deltas.append(abs(best[2] - ref_conf))
+
+    images = len(image_paths)
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "images": images,
+        "recall": round(matched / ref_total, 4) if ref_total else None,
+        "precision": round(matched / cand_total, 4) if cand_total else None,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "mean_conf_delta": round(float(np.mean(conf_deltas)), 4) if conf_deltas else None,
+        "reference_ms_per_image": round(ref_time * 1000 / images, 1) if images else None,
+        "candidate_ms_per_image": round(cand_time * 1000 / images, 1) if images else None,
+    }
+
+
 # --- LOGIKA INTI ---
 
 # Major rewrite of the verification logic for detailed comparison output.
-def verify_label_completeness(detected_objects, sql_query):
-    """Verify detected objects and return a structured comparison result."""
-    partcode_data = next((item for item in detected_objects if item['class_name'].lower() == 'partbom_partcode'), None)
+def find_partcode_object(detected_objects):
+    """The read Partbom_Partcode field of a label, or None."""
+    return next((item for item in detected_objects if item['class_name'].lower() == 'partbom_partcode'), None)
+
+def verify_label_completeness(detected_objects, label_type, templates=None):
+    """
+    Verify detected objects and return a structured comparison result.
+
+    templates optionally holds rows already fetched by MasterDataStore.get_templates; partcodes
+    missing from it are looked up one by one.
+    """
+    partcode_data = find_partcode_object(detected_objects)
     if not partcode_data or not partcode_data.get('text'):
         return 'DEFECT', [], [{'item': 'Partcode', 'reason': 'Missing', 'db_value': 'N/A', 'ocr_value': 'Not Detected'}]
 
-    partcode_value = str(partcode_data['text']).strip().lstrip('0')
+    partcode_value = normalize_partcode(partcode_data['text'])
     if not partcode_value:
         return 'DEFECT', [], [{'item': 'Partcode', 'reason': 'Invalid', 'db_value': 'N/A', 'ocr_value': partcode_data.get('text')}]
 
-    conn = None
     try:
-        conn = pyodbc.connect(SQL_SERVER_CONN_STR)
-        cur = conn.cursor()
-        cur.execute(sql_query, partcode_value)
-        template_row = cur.fetchone()
+        if templates is not None and master_data_key(partcode_value, label_type) in templates:
+            template_dict = templates[master_data_key(partcode_value, label_type)]
+        else:
+            template_dict = MASTER_DATA.get_template(partcode_value, label_type)
 
-        if not template_row:
+        if not template_dict:
             return 'DEFECT', [], [{'item': 'Partcode', 'reason': 'Not Found in DB', 'db_value': 'N/A', 'ocr_value': partcode_data.get('text')}]
 
-        colnames = [desc[0] for desc in cur.description]
-        template_dict = dict(zip(colnames, template_row))
-
         # Create a lookup map for detected objects for easier access
         detected_data_map = {item['class_name'].lower(): item.get('text', '') for item in detected_objects}
 
         matched_results = []
         defect_results = []
 
-        # Iterate through all possible fields based on the master mapping
-        for sql_alias, yolo_class in SQL_ALIAS_TO_YOLO_CLASS.items():
-            if sql_alias not in template_dict:
-                continue # Skip fields not present in the current query (e.g., inside vs outside)
+        # Only the fields selected by this label type's query (see FieldRules)
+        for rule in FIELD_RULES.for_label_type(label_type):
+            if rule.sql_alias not in template_dict:
+                continue
+            yolo_class = rule.yolo_class
 
-            db_value = template_dict.get(sql_alias)
-            ocr_value = detected_data_map.get(yolo_class.lower()) 
+            db_value = template_dict.get(rule.sql_alias)
+            ocr_value = detected_data_map.get(yolo_class.lower())
 
             is_required = db_value is not None and str(db_value).strip() not in ['0', '']
             is_detected = ocr_value is not None
@@ -191,16 +1226,9 @@ def verify_label_completeness(detected_objects, sql_query):
                         'item': yolo_class, 'reason': 'Missing',
                         'db_value': str(db_value), 'ocr_value': 'Not Detected'
                     })
-                else: 
-                    db_clean = clean_text_for_comparison(db_value)
-                    ocr_clean = clean_text_for_comparison(ocr_value)
-
-                    if yolo_class == 'Partbom_Partcode':
-                        db_clean = db_clean.lstrip('0')
-                        ocr_clean = ocr_clean.lstrip('0')
-                        
-                    is_match = (yolo_class in LOGO_CLASSES) or (db_clean == ocr_clean)
-                   
+                else:
+                    is_match = rule.logo or (rule.normalize(db_value) == rule.normalize(ocr_value))
+
                     if is_match:
                         matched_results.append({
                             'item': yolo_class, 'db_value': str(db_value), 'ocr_value': ocr_value
@@ -210,7 +1238,7 @@ def verify_label_completeness(detected_objects, sql_query):
                             'item': yolo_class, 'reason': 'Mismatch',
                             'db_value': str(db_value), 'ocr_value': ocr_value
                         })
-       
+
         status = 'DEFECT' if defect_results else 'OK'
         return status, matched_results, defect_results
 
@@ -218,181 +1246,801 @@ def verify_label_completeness(detected_objects, sql_query):
         return 'ERROR', [], [{'item': 'Database', 'reason': 'Connection Error', 'db_value': str(error), 'ocr_value': 'N/A'}]
     except Exception as e:
         return 'ERROR', [], [{'item': 'Processing', 'reason': 'Exception', 'db_value': str(e), 'ocr_value': 'N/A'}]
-    finally:
-        if conn:
-            conn.close()
 
-#
-# --- FUNGSI UTAMA ---
-#
-def run_detection_and_verification(image: np.ndarray, yolo_model: YOLO, label_type: str):
+def collect_field_boxes(detections, crop_box=None):
     """
-    Run detection and verification using the user's proximity analysis logic.
+    Convert detector output into field box dicts, skipping the 'inside'/'outside' label classes.
+
+    When crop_box (x1, y1, x2, y2) is given, only boxes whose center lies inside it are kept
+    and their coordinates are translated (and clipped) into the crop's coordinate system.
     """
-    output_image = image.copy()
-    
-    # Jalankan YOLO pada gambar yang sudah di-crop
-    yolo_results = yolo_model(image, verbose=False)[0]
-    class_names = yolo_results.names
-   
-    # Kumpulkan semua box hasil deteksi YOLO
-    all_yolo_boxes = []
-    for box in yolo_results.boxes:
-        coords = box.xyxy[0].tolist()
-        class_id = int(box.cls[0].item())
-        class_name = class_names.get(class_id, "Unknown")
-        
+    if crop_box is not None:
+        cx1, cy1, cx2, cy2 = (int(v) for v in crop_box)
+        crop_w, crop_h = cx2 - cx1, cy2 - cy1
+
+    field_boxes = []
+    for class_name, coords, confidence in detections:
         # Abaikan 'inside'/'outside' jika terdeteksi lagi di dalam crop
         if class_name.lower() in ['inside', 'outside']:
             continue
-            
-        all_yolo_boxes.append({
+
+        if crop_box is not None:
+            if not is_point_inside_box(get_box_center(coords), crop_box):
+                continue
+            x1, y1, x2, y2 = coords
+            coords = [
+                min(max(x1 - cx1, 0), crop_w), min(max(y1 - cy1, 0), crop_h),
+                min(max(x2 - cx1, 0), crop_w), min(max(y2 - cy1, 0), crop_h),
+            ]
+
+        field_boxes.append({
             "coords": coords,
             "class_name": class_name,
-            "confidence": box.conf[0].item(),
-            "needs_individual_ocr": False # Default ke False
+            "confidence": confidence,
         })
+    return field_boxes
 
-    # Jalankan Logika Analisis Kedekatan
-    print("Menganalisis kedekatan objek untuk menentukan strategi OCR...")
-    num_boxes = len(all_yolo_boxes)
-    for i in range(num_boxes):
-        for j in range(i + 1, num_boxes):
-            box_a = all_yolo_boxes[i]
-            box_b = all_yolo_boxes[j]
-            
-            x1_a, y1_a, x2_a, y2_a = box_a['coords']
-            x1_b, y1_b, x2_b, y2_b = box_b['coords']
-            
-            cy_a = (y1_a + y2_a) / 2
-            cy_b = (y1_b + y2_b) / 2
-            avg_height = ((y2_a - y1_a) + (y2_b - y1_b)) / 2
-
-            # Cek kedekatan di sumbu Y (apakah sebaris)
-            if abs(cy_a - cy_b) < avg_height * 0.5:
-                horizontal_gap = max(x1_a, x1_b) - min(x2_a, x2_b)
-                avg_width = ((x2_a - x1_a) + (x2_b - x1_b)) / 2
-                
-                # Cek kedekatan di sumbu X (apakah berdempetan)
-                if horizontal_gap < avg_width * 0.5:
-                    all_yolo_boxes[i]['needs_individual_ocr'] = True
-                    all_yolo_boxes[j]['needs_individual_ocr'] = True
-                    print(f"  -> Terdeteksi: '{box_a['class_name']}' dan '{box_b['class_name']}' berdekatan, akan gunakan OCR individual.")
-
-    # Jalankan OCR Global (pada gambar yang sudah di-crop)
-    print("Menjalankan OCR global...")
-    ocr_results_full, _ = OCR_ENGINE(image)
-    ocr_data = []
-    if ocr_results_full:
-        for res in ocr_results_full:
-            points = np.array(res[0])
-            # Koordinat sudah relatif terhadap 'image' (crop)
-            x_min, y_min = np.min(points, axis=0)
-            x_max, y_max = np.max(points, axis=0)
-            ocr_data.append(([x_min, y_min, x_max, y_max], res[1]))
-
-    # Proses setiap box dengan strategi yang sudah ditentukan
-    final_detected_objects = []
-    all_yolo_boxes.sort(key=lambda box: (box['coords'][1], box['coords'][0]))
+class OcrCache:
+    """
+    Content-addressed LRU cache of OCR results with a memory budget, keyed by a fast hash of the
+    crop pixels (see OCR_CACHE_KEY). Can be switched off at runtime for auditing runs.
+    """
 
-    for box in all_yolo_boxes:
-        class_name = box['class_name']
-        coords = box['coords']
-        detected_text = ""
+    def __init__(self, max_bytes=OCR_CACHE_MAX_MB * 1024 * 1024, key_mode=OCR_CACHE_KEY, enabled=OCR_CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        self.enabled = enabled
+        self._entries = OrderedDict()  # (kind, digest) -> (size, value, thumbnail)
+        self._buckets = {}             # (kind, thumbnail shape) -> OrderedDict of entry keys (perceptual mode)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
 
-        if class_name in LOGO_CLASSES:
-            detected_text = "TERDETEKSI"
-        elif box['needs_individual_ocr']:
-            # STRATEGI A: OCR Individual (Presisi)
-            print(f"  -> Menjalankan OCR individual untuk: {class_name}")
-            x1, y1, x2, y2 = map(int, coords)
-            box_crop = image[y1:y2, x1:x2]
-            if box_crop.size > 0:
-                ocr_result_box, _ = OCR_ENGINE(box_crop)
-                if ocr_result_box:
-                    detected_text = " ".join([res[1] for res in ocr_result_box])
+    def key(self, kind, crop):
+        """Return (kind, digest, thumbnail); thumbnail is None unless key_mode is 'perceptual'."""
+        if self.key_mode == 'perceptual':
+            height = OCR_CACHE_PERCEPTUAL_HEIGHT
+            width = max(1, round(crop.shape[1] * height / crop.shape[0]))
+            gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            thumbnail = cv2.GaussianBlur(cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA), (3, 3), 0)
+            data, shape = thumbnail.tobytes(), thumbnail.shape
         else:
-            # STRATEGI B: OCR Global (Default)
-            contained_texts = []
-            for ocr_box_coords, ocr_text in ocr_data:
-                if is_point_inside_box(get_box_center(ocr_box_coords), coords):
-                    contained_texts.append(ocr_text)
-            if contained_texts:
-                detected_text = " ".join(contained_texts)
-        
-        fields_to_split_and_remove_colon = [
-            'PartBOM_Voltage', 
-            'PartBOM_Applicable',
-            'PartBOM_StripLength', 
-            'PartBOM_WireStripLen'
-        ]
+            thumbnail = None
+            data, shape = np.ascontiguousarray(crop).tobytes(), crop.shape
+        digest = hashlib.blake2b(data, digest_size=16)
+        digest.update(repr(shape).encode())
+        return kind, digest.hexdigest(), thumbnail
 
-        if class_name == 'PartBOM_ULType':
-            # Pengecualian 1: Hapus 'CU'
-            detected_text = detected_text.replace("CU", "").strip()
-        
-        elif class_name == 'PartBOM_Current':
-            # Pengecualian 2 Hapus teks SEBELUM ':', tapi TETAPKAN ':'
-            colon_index = detected_text.find(":")
-            if colon_index != -1:
-                # Ambil dari ':' (termasuk) sampai akhir, lalu strip
-                detected_text = detected_text[colon_index:].strip()
-
-        elif class_name in fields_to_split_and_remove_colon:
-            # Logika Default: Jika ada ':', ambil semua teks SETELAH ':' pertama
-            if ":" in detected_text:
-                detected_text = detected_text.split(":", 1)[-1].strip()
-        
-        final_detected_objects.append({'class_name': class_name, 'text': detected_text})
-       
-        # Logika menggambar
-        x1, y1, x2, y2 = map(int, coords)
-        cv2.rectangle(output_image, (x1, y1), (x2, y2), (255, 0, 0), 2)
-        label = f"{class_name}: {detected_text}" if detected_text else class_name
-        cv2.putText(output_image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+    def _find_similar(self, kind, thumbnail):
+        bucket = self._buckets.get((kind, thumbnail.shape))
+        if not bucket:
+            return None
+        probe = thumbnail.astype(np.int16)
+        for entry_key in list(reversed(bucket))[:OCR_CACHE_PERCEPTUAL_SCAN]:
+            cached_thumbnail = self._entries[entry_key][2]
+            if np.abs(cached_thumbnail.astype(np.int16) - probe).max() <= OCR_CACHE_PERCEPTUAL_MAX_DIFF:
+                return entry_key
+        return None
 
-    # 6. Verifikasi hasil
-    query_to_use = QUERY_OUTSIDE_LABEL if label_type == 'outside' else QUERY_INSIDE_LABEL
-    print(f"Using {label_type.upper()} label query for verification.")
+    def get(self, key):
+        kind, digest, thumbnail = key
+        with self._lock:
+            entry_key = (kind, digest)
+            if entry_key not in self._entries and thumbnail is not None:
+                entry_key = self._find_similar(kind, thumbnail)
+            if entry_key is None or entry_key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return self._entries[entry_key][1]
 
-    status, matched, defects = verify_label_completeness(final_detected_objects, query_to_use)
-   
-    status_color = (0, 255, 0) if status == 'OK' else (0, 0, 255)
-    cv2.putText(output_image, f"Status: {status}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2, cv2.LINE_AA)
-   
-    return output_image, status, matched, defects
+    def put(self, key, value):
+        kind, digest, thumbnail = key
+        entry_key = (kind, digest)
+        size = len(repr(value)) + 200 + (thumbnail.nbytes if thumbnail is not None else 0)
+        with self._lock:
+            self._discard(entry_key)
+            self._entries[entry_key] = (size, value, thumbnail)
+            self._bytes += size
+            if thumbnail is not None:
+                self._buckets.setdefault((kind, thumbnail.shape), OrderedDict())[entry_key] = None
+            while self._bytes > self.max_bytes and self._entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
 
+    def _discard(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[0]
+        if entry[2] is not None:
+            bucket_key = (entry_key[0], entry[2].shape)
+            bucket = self._buckets[bucket_key]
+            bucket.pop(entry_key, None)
+            if not bucket:
+                del self._buckets[bucket_key]
 
-# --- KELAS MANAJEMEN KAMERA & APLIKASI FLASK ---
-class LabelDetector:
-    def __init__(self):
-        self.cap = None
-        self.thread = None
-        self.latest_frame = None
-        self.return_frame = None
-        self.running = False
-        self.yolo_model = None
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+            self.generation += 1  # Tells inference worker processes to clear their caches too
 
-    def _get_yolo_model(self):
-        if self.yolo_model is None:
-            self.yolo_model = YOLO(MODEL_PATH)
-        return self.yolo_model
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "key_mode": self.key_mode,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+OCR_CACHE = OcrCache()
+
+def run_ocr(image):
+    """RapidOCR detection + recognition through the OCR cache; returns the result list or None."""
+    if not OCR_CACHE.enabled:
+        return get_ocr_engine()(image)[0]
+    key = OCR_CACHE.key('full', image)
+    result = OCR_CACHE.get(key)
+    if result is None:
+        result = get_ocr_engine()(image)[0] or []
+        OCR_CACHE.put(key, result)
+    return result or None
+
+def recognize_field_crops(image, boxes):
+    """
+    Run recognition-only OCR over the field crops of 'image' in one batched call.
+
+    Each crop is padded by OCR_REC_PADDING pixels and resized to OCR_REC_HEIGHT before being
+    handed to the RapidOCR recognizer. Returns a list of (text, score) aligned with boxes.
+    """
+    return recognize_label_fields([(image, boxes)])[0]
 
-    def get_camera(self):
+def recognize_label_fields(labels):
+    """
+    recognize_field_crops for several label images, (image, boxes) each, with all their field crops
+    in a single recognizer call. Returns one list of (text, score) per label.
+    """
+    results = [[("", 0.0)] * len(boxes) for _, boxes in labels]
+    crops, crop_indices = [], []
+    for label_index, (image, boxes) in enumerate(labels):
+        img_h, img_w = image.shape[:2]
+        for index, box in enumerate(boxes):
+            x1, y1, x2, y2 = map(int, box['coords'])
+            x1, y1 = max(0, x1 - OCR_REC_PADDING), max(0, y1 - OCR_REC_PADDING)
+            x2, y2 = min(img_w, x2 + OCR_REC_PADDING), min(img_h, y2 + OCR_REC_PADDING)
+            crop = image[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            scale = OCR_REC_HEIGHT / crop.shape[0]
+            crop = cv2.resize(crop, (max(1, round(crop.shape[1] * scale)), OCR_REC_HEIGHT),
+                              interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+            crops.append(crop)
+            crop_indices.append((label_index, index))
+
+    # Hanya crop yang belum ada di cache yang dikirim ke recognizer
+    to_recognize, keys = [], []
+    for crop, (label_index, index) in zip(crops, crop_indices):
+        if OCR_CACHE.enabled:
+            key = OCR_CACHE.key('rec', crop)
+            cached = OCR_CACHE.get(key)
+            if cached is not None:
+                results[label_index][index] = cached
+                continue
+            keys.append(key)
+        to_recognize.append((crop, label_index, index))
+    if to_recognize:
+        rec_res, _ = get_ocr_engine().text_rec([crop for crop, _, _ in to_recognize])
+        for position, ((_, label_index, index), res) in enumerate(zip(to_recognize, rec_res)):
+            results[label_index][index] = (res[0], float(res[1]))
+            if OCR_CACHE.enabled:
+                OCR_CACHE.put(keys[position], results[label_index][index])
+    return results
+
+#
+# --- FUNGSI UTAMA ---
+#
+def run_detection_and_verification(image: np.ndarray, yolo_model, label_type: str, field_boxes=None,
+                                   ocr_mode=None, timings=None):
+    """
+    Run detection and verification using the user's proximity analysis logic.
+
+    If field_boxes is given (already in the coordinates of 'image'), the YOLO field pass is skipped.
+    If a timings dict is given, it is filled with the OCR and verification stage durations in
+    milliseconds (plus the 'ocr_fallbacks' count).
+
+    Returns (objects, status, matched, defects), where objects are the read fields as
+    {'class_name', 'text', 'coords'} in 'image' pixels. Nothing is drawn here; see Annotation.
+    """
+    timings = {} if timings is None else timings
+
+    if field_boxes is None:
+        # Jalankan YOLO pada gambar yang sudah di-crop
+        field_boxes = collect_field_boxes(yolo_model.predict(image))
+
+    final_detected_objects = read_label_fields(image, field_boxes, ocr_mode, timings)
+
+    # 6. Verifikasi hasil
+    label_type = 'outside' if label_type == 'outside' else 'inside'
+    print(f"Using {label_type.upper()} label query for verification.")
+
+    verification_start = time.perf_counter()
+    status, matched, defects = verify_label_completeness(final_detected_objects, label_type)
+    timings['verification_ms'] = round((time.perf_counter() - verification_start) * 1000, 1)
+
+    return final_detected_objects, status, matched, defects
+
+def reading_order(box):
+    """Sort key of field boxes: top to bottom, then left to right."""
+    return box['coords'][1], box['coords'][0]
+
+def read_label_fields(image, field_boxes, ocr_mode=None, timings=None, rec_results=None):
+    """
+    Read the text of every field box of one label image (OCR strategy per ocr_mode, cleanup per the
+    field rules) and return the objects as {'class_name', 'text', 'coords'}.
+
+    rec_results, if given, is the recognize_field_crops output for the non-logo boxes in reading order,
+    already computed for several labels at once; only the fallbacks then run here.
+    """
+    ocr_mode = ocr_mode or OCR_MODE
+    timings = {} if timings is None else timings
+
+    # Kumpulkan semua box hasil deteksi YOLO
+    all_yolo_boxes = [dict(box, needs_individual_ocr=False) for box in field_boxes] # Default ke False
+
+    # Urutkan box dari atas ke bawah, kiri ke kanan
+    proximity_start = time.perf_counter()
+    all_yolo_boxes.sort(key=reading_order)
+    box_store = BoxStore([box['coords'] for box in all_yolo_boxes])
+
+    # Jalankan Logika Analisis Kedekatan
+    print("Menganalisis kedekatan objek untuk menentukan strategi OCR...")
+    for i, j in box_store.adjacent_pairs():
+        all_yolo_boxes[i]['needs_individual_ocr'] = True
+        all_yolo_boxes[j]['needs_individual_ocr'] = True
+        print(f"  -> Terdeteksi: '{all_yolo_boxes[i]['class_name']}' dan '{all_yolo_boxes[j]['class_name']}' berdekatan, akan gunakan OCR individual.")
+    timings['proximity_ms'] = round((time.perf_counter() - proximity_start) * 1000, 1)
+
+    # Mode 'recognition': baca semua field non-logo sekaligus dengan recognizer saja
+    recognized_texts = {}
+    if ocr_mode == 'recognition':
+        print("Menjalankan OCR recognition (batch) pada semua field...")
+        ocr_start = time.perf_counter()
+        text_indices = [i for i, box in enumerate(all_yolo_boxes) if box['class_name'] not in LOGO_CLASSES]
+        if rec_results is None:
+            rec_results = recognize_field_crops(image, [all_yolo_boxes[i] for i in text_indices])
+        for i, (text, score) in zip(text_indices, rec_results):
+            if text and score >= OCR_REC_MIN_SCORE:
+                recognized_texts[i] = text
+            else:
+                print(f"  -> Skor recognition rendah untuk '{all_yolo_boxes[i]['class_name']}' ({score:.2f}), fallback ke deteksi.")
+        timings['recognition_ocr_ms'] = round((time.perf_counter() - ocr_start) * 1000, 1)
+
+    # Box yang belum terbaca memakai strategi lama (OCR individual atau OCR global)
+    pending = [
+        i for i, box in enumerate(all_yolo_boxes)
+        if box['class_name'] not in LOGO_CLASSES and i not in recognized_texts
+    ]
+    timings['ocr_fallbacks'] = len(pending) if ocr_mode == 'recognition' else 0
+
+    ocr_data = []
+    if any(not all_yolo_boxes[i]['needs_individual_ocr'] for i in pending):
+        # Jalankan OCR Global (pada gambar yang sudah di-crop)
+        print("Menjalankan OCR global...")
+        ocr_start = time.perf_counter()
+        ocr_results_full = run_ocr(image)
+        if ocr_results_full:
+            for res in ocr_results_full:
+                points = np.array(res[0])
+                # Koordinat sudah relatif terhadap 'image' (crop)
+                x_min, y_min = np.min(points, axis=0)
+                x_max, y_max = np.max(points, axis=0)
+                ocr_data.append(([x_min, y_min, x_max, y_max], res[1]))
+        timings['global_ocr_ms'] = round((time.perf_counter() - ocr_start) * 1000, 1)
+
+    # Tetapkan setiap hasil OCR global ke box YOLO yang memuat titik tengahnya
+    ocr_assignments = box_store.assign_centers([coords for coords, _ in ocr_data])
+
+    # Proses setiap box dengan strategi yang sudah ditentukan
+    final_detected_objects = []
+    individual_ocr_time = 0.0
+
+    for box_index, box in enumerate(all_yolo_boxes):
+        class_name = box['class_name']
+        coords = box['coords']
+        detected_text = ""
+
+        if class_name in LOGO_CLASSES:
+            detected_text = "TERDETEKSI"
+        elif box_index in recognized_texts:
+            # STRATEGI C: OCR Recognition (batch, dipandu YOLO)
+            detected_text = recognized_texts[box_index]
+        elif box['needs_individual_ocr']:
+            # STRATEGI A: OCR Individual (Presisi)
+            print(f"  -> Menjalankan OCR individual untuk: {class_name}")
+            ocr_start = time.perf_counter()
+            x1, y1, x2, y2 = map(int, coords)
+            box_crop = image[y1:y2, x1:x2]
+            if box_crop.size > 0:
+                ocr_result_box = run_ocr(box_crop)
+                if ocr_result_box:
+                    detected_text = " ".join([res[1] for res in ocr_result_box])
+            individual_ocr_time += time.perf_counter() - ocr_start
+        else:
+            # STRATEGI B: OCR Global (Default)
+            contained_texts = [ocr_data[k][1] for k in ocr_assignments[box_index]]
+            if contained_texts:
+                detected_text = " ".join(contained_texts)
+        
+        # Field-specific cleanup from the rule table (e.g. drop the 'Voltage:' caption)
+        rule = FIELD_RULES.get(class_name)
+        if rule is not None:
+            detected_text = rule.clean_ocr(detected_text)
+
+        # Gambar anotasi dibuat belakangan (Annotation.jpeg), di sini hanya geometri box
+        final_detected_objects.append({
+            'class_name': class_name, 'text': detected_text, 'coords': [int(v) for v in coords],
+        })
+
+    if individual_ocr_time:
+        timings['individual_ocr_ms'] = round(individual_ocr_time * 1000, 1)
+
+    return final_detected_objects
+
+
+def record_inspection_metrics(result):
+    """Count an inspection and observe its stage timings (always in the server process)."""
+    if not result.get("success"):
+        INSPECTIONS_TOTAL.inc(status="FAILED")
+        return
+    for stage, duration_ms in result.get("timings", {}).items():
+        if stage == 'per_label_ms':
+            continue  # Derived from total_ms in 'multi' label mode, not a pipeline stage
+        INSPECTION_STAGE_SECONDS.observe(duration_ms / 1000, stage=stage[:-3])
+    INSPECTIONS_TOTAL.inc(status=result["status"])
+
+def no_label_result(label_mode, crop_detection_time, inspection_start):
+    """
+    Outcome of an inspection that requires a label (continuous mode) when the frame holds no 'inside'/'outside'
+    box: the fixture is empty, so there is nothing to check and nothing to record as a DEFECT.
+    """
+    return {
+        "success": True,
+        "status": 'NO_LABEL',
+        "message": "No label in view",
+        "label_mode": label_mode,
+        "label_type": None,
+        "partcode": None,
+        "matched_results": [],
+        "defect_results": [],
+        "timings": {
+            "crop_detection_ms": round(crop_detection_time * 1000, 1),
+            "total_ms": round((time.perf_counter() - inspection_start) * 1000, 1),
+        },
+    }
+
+def result_partcode(matched_results, defect_results):
+    """The OCR'd partcode of an inspection, taken from its matched/defect items."""
+    for item in matched_results + defect_results:
+        if item['item'] in ('Partbom_Partcode', 'Partcode') and item.get('ocr_value') not in (None, 'Not Detected'):
+            return str(item['ocr_value'])
+    return None
+
+def find_label_box(detections):
+    """Pick the label to inspect: the most confident 'inside' box, else the most confident 'outside' box.
+    Returns (label_type, int box) or (None, None)."""
+    best = {'inside': (0.0, None), 'outside': (0.0, None)}
+    for class_name, coords, confidence in detections:
+        class_name = class_name.lower()
+        if class_name in best and confidence > best[class_name][0]:
+            best[class_name] = (confidence, np.array(coords).astype(int))
+    for label_type in ('inside', 'outside'):
+        if best[label_type][1] is not None:
+            return label_type, best[label_type][1]
+    return None, None
+
+
+def find_label_boxes(detections, min_conf=LABEL_MIN_CONF, max_count=LABEL_MAX_COUNT, overlap_iou=LABEL_OVERLAP_IOU):
+    """All labels to inspect in 'multi' label mode: 'inside'/'outside' boxes of at least min_conf, one per
+    overlapping group (the most confident), in reading order. Returns a list of (label_type, int box, confidence)."""
+    candidates = sorted(
+        ((class_name.lower(), np.array(coords).astype(int), confidence)
+         for class_name, coords, confidence in detections
+         if class_name.lower() in ('inside', 'outside') and confidence >= min_conf),
+        key=lambda label: -label[2])
+    labels = []
+    for label in candidates:
+        if all(box_iou(label[1], kept[1]) <= overlap_iou for kept in labels):
+            labels.append(label)
+        if len(labels) == max_count:
+            break
+    return sorted(labels, key=lambda label: (label[1][1], label[1][0]))
+
+
+class RoiTracker:
+    """
+    Remembers the last inside/outside label box per camera and proposes a padded search region around
+    it for the next inspection. Time saved is estimated against a running average of full-frame searches.
+    """
+
+    def __init__(self, padding=ROI_PADDING, enabled=ROI_TRACKING):
+        self.padding = padding
+        self.enabled = enabled
+        self._boxes = {}  # camera -> last label box (x1, y1, x2, y2) in frame pixels
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+        self.full_frame = 0
+        self.full_frame_avg = None  # Exponential moving average of full-frame localization (seconds)
+        self.saved = 0.0
+        self.generation = 0
+
+    def region(self, key, frame_shape):
+        """Padded region (x1, y1, x2, y2) around the last box for this camera, or None for a full-frame search."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            box = self._boxes.get(key)
+        if box is None:
+            return None
+        frame_h, frame_w = frame_shape[:2]
+        x1, y1, x2, y2 = box
+        pad_x, pad_y = (x2 - x1) * self.padding, (y2 - y1) * self.padding
+        region = (max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                  min(frame_w, int(x2 + pad_x)), min(frame_h, int(y2 + pad_y)))
+        area = (region[2] - region[0]) * (region[3] - region[1])
+        if area <= 0 or area > ROI_MAX_AREA * frame_w * frame_h:
+            return None
+        return region
+
+    @staticmethod
+    def contains(region, box, frame_shape):
+        """True if box lies inside region, away from any region border that is not also a frame border."""
+        frame_h, frame_w = frame_shape[:2]
+        rx1, ry1, rx2, ry2 = region
+        x1, y1, x2, y2 = box
+        margin = ROI_EDGE_MARGIN
+        return ((rx1 == 0 or x1 > rx1 + margin) and (ry1 == 0 or y1 > ry1 + margin) and
+                (rx2 == frame_w or x2 < rx2 - margin) and (ry2 == frame_h or y2 < ry2 - margin))
+
+    def record(self, key, box, roi_seconds=None, full_seconds=None):
+        """Store the new box (None forgets it) and account for the search: ROI only (hit), ROI then full
+        frame (fallback) or full frame only."""
+        with self._lock:
+            if box is None:
+                self._boxes.pop(key, None)
+            else:
+                self._boxes[key] = tuple(int(v) for v in box)
+            if full_seconds is not None:
+                self.full_frame_avg = (full_seconds if self.full_frame_avg is None
+                                       else 0.9 * self.full_frame_avg + 0.1 * full_seconds)
+            if roi_seconds is None:
+                self.full_frame += 1
+                outcome = 'full_frame'
+            elif full_seconds is None:
+                self.hits += 1
+                if self.full_frame_avg is not None:
+                    self.saved += self.full_frame_avg - roi_seconds
+                outcome = 'hit'
+            else:
+                self.fallbacks += 1
+                self.saved -= roi_seconds  # The ROI pass was wasted
+                outcome = 'fallback'
+        ROI_TRACKER_TOTAL.inc(outcome=outcome)
+        return outcome
+
+    def reset(self):
+        with self._lock:
+            self._boxes.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            attempts = self.hits + self.fallbacks
+            return {
+                "enabled": self.enabled,
+                "tracked_cameras": len(self._boxes),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "full_frame": self.full_frame,
+                "hit_rate": round(self.hits / attempts, 4) if attempts else 0.0,
+                "full_frame_avg_ms": round(self.full_frame_avg * 1000, 1) if self.full_frame_avg is not None else None,
+                "time_saved_ms": round(self.saved * 1000, 1),
+            }
+
+
+ROI_TRACKER = RoiTracker()
+
+class Annotation:
+    """
+    What is needed to draw an inspection's annotated image later: the label crop, the read field boxes
+    and the status. Rendered JPEGs are cached per (quality, scale).
+    """
+
+    def __init__(self, image, objects, status, crop_box=None):
+        self.image = image
+        self.objects = objects
+        self.status = status
+        self.crop_box = crop_box
+        self._jpegs = {}
+        self._lock = threading.Lock()
+
+    def geometry(self):
+        """JSON-friendly box geometry, so clients can draw overlays themselves."""
+        height, width = self.image.shape[:2]
+        return {
+            "crop_box": [int(v) for v in self.crop_box] if self.crop_box is not None else None,
+            "image_size": [width, height],
+            "boxes": self.objects,
+        }
+
+    def render(self):
+        output_image = self.image.copy()
+        for obj in self.objects:
+            x1, y1, x2, y2 = obj['coords']
+            cv2.rectangle(output_image, (x1, y1), (x2, y2), (255, 0, 0), 2)
+            label = f"{obj['class_name']}: {obj['text']}" if obj['text'] else obj['class_name']
+            cv2.putText(output_image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        status_color = (0, 255, 0) if self.status == 'OK' else (0, 0, 255)
+        cv2.putText(output_image, f"Status: {self.status}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2, cv2.LINE_AA)
+        return output_image
+
+    def jpeg(self, quality=ANNOTATION_JPEG_QUALITY, scale=ANNOTATION_SCALE):
+        key = (quality, scale)
+        with self._lock:
+            if key not in self._jpegs:
+                output_image = self.render()
+                if scale < 1.0:
+                    output_image = cv2.resize(output_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                _, buffer = cv2.imencode(".jpg", output_image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                self._jpegs[key] = buffer.tobytes()
+            return self._jpegs[key]
+
+
+class AnnotationStore:
+    """LRU of the most recent inspections' annotations, keyed by inspection_id."""
+
+    def __init__(self, max_entries=ANNOTATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, inspection_id, annotation):
+        with self._lock:
+            self._entries[inspection_id] = annotation
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, inspection_id):
+        with self._lock:
+            annotation = self._entries.get(inspection_id)
+            if annotation is not None:
+                self._entries.move_to_end(inspection_id)
+            return annotation
+
+    def pop(self, inspection_id):
+        with self._lock:
+            return self._entries.pop(inspection_id, None)
+
+
+ANNOTATIONS = AnnotationStore()
+
+# --- KELAS MANAJEMEN KAMERA & APLIKASI FLASK ---
+class StabilityTrigger:
+    """
+    Cheap motion/stability check for continuous mode, based on frame differencing of a
+    downscaled grayscale thumbnail.
+
+    update() returns True once when the scene settles after motion. It is re-armed only by new
+    motion, and a settled scene that matches the last triggered one (same label, e.g. after a
+    hand passed over it) is not triggered again until the label leaves the view. An auto
+    inspection that finds no label reports its frame through label_absent(); that scene is
+    then known as the empty fixture, which resets the debounce whenever it shows up and is
+    never triggered itself.
+    """
+
+    def __init__(self, width=AUTO_MOTION_WIDTH, threshold=AUTO_MOTION_THRESHOLD, stable_frames=AUTO_STABLE_FRAMES):
+        self.width = width
+        self.threshold = threshold
+        self.stable_frames = stable_frames
+        self.previous = None
+        self.last_triggered = None
+        self.empty_scene = None
+        self.still_count = 0
+        self.armed = False
+        self.triggers = 0
+        self.skipped_duplicates = 0
+        self.skipped_empty = 0
+
+    def _thumbnail(self, frame):
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+    def update(self, frame):
+        thumb = self._thumbnail(frame)
+        previous, self.previous = self.previous, thumb
+        if previous is None:
+            return False
+
+        empty_scene = self.empty_scene
+        empty = empty_scene is not None and cv2.absdiff(thumb, empty_scene).mean() <= self.threshold
+        if empty:
+            # The label has left the view: the next label is new even if it looks the same
+            self.last_triggered = None
+
+        if cv2.absdiff(thumb, previous).mean() > self.threshold:
+            self.still_count = 0
+            self.armed = True
+            return False
+
+        self.still_count += 1
+        if not self.armed or self.still_count < self.stable_frames:
+            return False
+
+        self.armed = False
+        if empty:
+            self.skipped_empty += 1
+            return False
+        if self.last_triggered is not None and cv2.absdiff(thumb, self.last_triggered).mean() <= self.threshold:
+            self.skipped_duplicates += 1
+            return False
+        self.last_triggered = thumb
+        self.triggers += 1
+        return True
+
+    def label_absent(self, frame):
+        """An auto inspection of this frame found no label: remember it as the empty fixture."""
+        self.empty_scene = self._thumbnail(frame)
+        self.last_triggered = None
+
+    def stats(self):
+        return {
+            "armed": self.armed,
+            "still_frames": self.still_count,
+            "triggers": self.triggers,
+            "skipped_duplicates": self.skipped_duplicates,
+            "skipped_empty": self.skipped_empty,
+            "empty_scene_known": self.empty_scene is not None,
+        }
+
+
+# --- KAMERA ---
+_camera_cache_lock = threading.Lock()
+# Serializes opening so two cameras never probe and claim the same device at once
+_camera_open_lock = threading.Lock()
+
+def _open_capture(index, backend):
+    """Open one device and read a test frame; returns the capture or None."""
+    cap = cv2.VideoCapture(index, getattr(cv2, f"CAP_{backend}", cv2.CAP_ANY))
+    if cap.isOpened():
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+        if cap.read()[0]:
+            return cap
+    cap.release()
+    return None
+
+def probe_cameras(indices=CAMERA_PROBE_INDICES, backends=CAMERA_PROBE_BACKENDS, exclude=()):
+    """
+    Try all device indices in parallel (backends in order per index) and return the working ones as
+    a list of (index, backend, capture) sorted by index. The caller releases captures it does not keep.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def probe(index):
+        for backend in backends:
+            cap = _open_capture(index, backend)
+            if cap is not None:
+                return index, backend, cap
+        return None
+
+    indices = [index for index in indices if index not in exclude]
+    if not indices:
+        return []
+    with ThreadPoolExecutor(max_workers=len(indices)) as pool:
+        return [found for found in pool.map(probe, indices) if found is not None]
+
+def load_camera_cache(path=CAMERA_CACHE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_camera_device(name, index, backend, path=CAMERA_CACHE_FILE):
+    with _camera_cache_lock:
+        devices = load_camera_cache(path)
+        if devices.get(name) == {"index": index, "backend": backend}:
+            return
+        devices[name] = {"index": index, "backend": backend}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(devices, f, indent=1)
+        except OSError as e:
+            print(f"Peringatan: Gagal menyimpan cache kamera: {e}")
+
+
+class Camera:
+    """One named camera: capture thread, latest-frame buffer, on-demand preview and auto trigger."""
+
+    def __init__(self, name, index=None, backend=None):
+        self.name = name
+        self.index = index        # Configured device index (None = probe)
+        self.backend = backend    # Configured capture API (None = probe)
+        self.device = None        # (index, backend) actually opened
+        self.cap = None
+        self.thread = None
+        self.latest_frame = None
+        self.frame_seq = 0
+        self.frame_cond = threading.Condition()
+        self._preview_cache = (None, None, None)  # (frame_seq, width, jpeg bytes)
+        self._preview_b64 = (None, None, None)    # (frame_seq, width, base64 string)
+        self._preview_lock = threading.Lock()
+        self.running = False
+        self.capture_fps = 0.0
+        # Continuous mode: on_auto_trigger(camera_name, frame) is called from the capture thread
+        self.auto_trigger = None
+        self.on_auto_trigger = None
+        self.last_auto_job_id = None
+
+    def open(self, exclude=()):
+        """Open the device (cached, configured or probed) and start capturing; exclude = indices in use."""
         if self.cap is not None: return {"success": True}
-        for i in range(10):
-            self.cap = cv2.VideoCapture(i)
-            if self.cap.isOpened():
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
-                self.start_thread()
-                return {"success": True, "message": f"Camera found at index {i}"}
-        return {"success": False, "message": "No camera found"}
+        backends = [self.backend] if self.backend else list(CAMERA_PROBE_BACKENDS)
+        cached = load_camera_cache().get(self.name)
+        candidates = []
+        if self.index is not None:
+            candidates = [(self.index, backend) for backend in backends]
+        elif cached and cached.get("index") not in exclude:
+            candidates = [(cached["index"], cached.get("backend") or backends[0])]
+        # Fast path: the configured or last known device, without probing
+        for index, backend in candidates:
+            self.cap = _open_capture(index, backend)
+            if self.cap is not None:
+                return self._started(index, backend)
+        if self.index is not None:
+            return {"success": False, "message": f"Camera '{self.name}' not available at index {self.index}"}
+
+        found = probe_cameras(backends=backends, exclude=exclude)
+        if not found:
+            return {"success": False, "message": "No camera found"}
+        index, backend, self.cap = found[0]
+        for _, _, cap in found[1:]:
+            cap.release()
+        return self._started(index, backend)
+
+    def _started(self, index, backend):
+        self.device = (index, backend)
+        save_camera_device(self.name, index, backend)
+        self.start_thread()
+        return {"success": True, "message": f"Camera found at index {index}", "camera": self.name}
+
+    def close(self):
+        self.stop_thread()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.device = None
 
     def start_thread(self):
-        if not self.running and (self.thread is None or not self.thread.is_alive()):
+        if self.cap is not None and not self.running and (self.thread is None or not self.thread.is_alive()):
             self.running = True
-            self.thread = threading.Thread(target=self._update_frame, daemon=True)
+            self.thread = threading.Thread(target=self._update_frame, name=f"camera-{self.name}", daemon=True)
             self.thread.start()
 
     def stop_thread(self):
@@ -401,66 +2049,271 @@ class LabelDetector:
             if self.thread: self.thread.join()
 
     def _update_frame(self):
+        fps_window_start, fps_window_frames = time.monotonic(), 0
         while self.running:
             ret, frame = self.cap.read()
-            if ret:
-                self.latest_frame = frame
-                _, buffer = cv2.imencode(".jpg", frame)
-                self.return_frame = base64.b64encode(buffer).decode("utf-8")
+            if not ret:
+                CAMERA_FRAMES_DROPPED_TOTAL.inc(camera=self.name)
+            else:
+                CAMERA_FRAMES_TOTAL.inc(camera=self.name)
+                fps_window_frames += 1
+                elapsed = time.monotonic() - fps_window_start
+                if elapsed >= 1.0:
+                    self.capture_fps = fps_window_frames / elapsed
+                    fps_window_start, fps_window_frames = time.monotonic(), 0
+                # Preview encoding happens on demand in get_preview_jpeg(), not here
+                with self.frame_cond:
+                    self.latest_frame = frame
+                    self.frame_seq += 1
+                    self.frame_cond.notify_all()
+                trigger = self.auto_trigger
+                if trigger is not None and trigger.update(frame) and self.on_auto_trigger:
+                    self.on_auto_trigger(self.name, frame.copy())
             time.sleep(0.03)
 
-    def get_frame(self):
-        if self.return_frame: return {"success": "success", "frame": self.return_frame}
-        return {"success": "noframe", "message": "No frame available"}
-       
-    def process_image(self):
-        if self.latest_frame is None:
+    def set_auto_inspect(self, enabled):
+        if enabled and self.auto_trigger is None:
+            self.auto_trigger = StabilityTrigger()
+        elif not enabled:
+            self.auto_trigger = None
+
+    def get_preview_jpeg(self, width=None):
+        """Return (frame_seq, jpeg bytes) of the latest frame, encoding it at most once per frame and width."""
+        width = PREVIEW_WIDTH if width is None else width
+        with self.frame_cond:
+            frame, seq = self.latest_frame, self.frame_seq
+        if frame is None:
+            return seq, None
+        with self._preview_lock:
+            cached_seq, cached_width, jpeg = self._preview_cache
+            if cached_seq == seq and cached_width == width:
+                return seq, jpeg
+            encode_start = time.perf_counter()
+            if width and frame.shape[1] > width:
+                height = round(frame.shape[0] * width / frame.shape[1])
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_JPEG_QUALITY])
+            jpeg = buffer.tobytes()
+            PREVIEW_ENCODE_SECONDS.observe(time.perf_counter() - encode_start)
+            self._preview_cache = (seq, width, jpeg)
+            return seq, jpeg
+
+    def get_frame(self, width=None):
+        width = PREVIEW_WIDTH if width is None else width
+        seq, jpeg = self.get_preview_jpeg(width)
+        if jpeg is None:
+            return {"success": "noframe", "message": "No frame available"}
+        with self._preview_lock:
+            cached_seq, cached_width, encoded = self._preview_b64
+            if cached_seq != seq or cached_width != width:
+                encoded = base64.b64encode(jpeg).decode("utf-8")
+                self._preview_b64 = (seq, width, encoded)
+        return {"success": "success", "frame": encoded, "seq": seq}
+
+    def stream_frames(self, width=None):
+        """Yield multipart/x-mixed-replace JPEG parts whenever a new frame is captured."""
+        min_interval = 1.0 / STREAM_MAX_FPS
+        last_seq = None
+        while True:
+            with self.frame_cond:
+                if self.frame_seq == last_seq:
+                    self.frame_cond.wait(timeout=1.0)
+                if self.frame_seq == last_seq:
+                    continue
+            sent_at = time.monotonic()
+            last_seq, jpeg = self.get_preview_jpeg(width)
+            if jpeg is None:
+                continue
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(jpeg)).encode() +
+                   b"\r\n\r\n" + jpeg + b"\r\n")
+            time.sleep(max(0.0, min_interval - (time.monotonic() - sent_at)))
+
+    def snapshot_frame(self):
+        """Return a private copy of the latest captured frame, or None."""
+        with self.frame_cond:
+            return None if self.latest_frame is None else self.latest_frame.copy()
+
+    def stats(self):
+        index, backend = self.device or (None, None)
+        return {
+            "name": self.name,
+            "open": self.cap is not None,
+            "running": self.running,
+            "index": index,
+            "backend": backend,
+            "capture_fps": round(self.capture_fps, 2) if self.running else 0,
+            "frame_seq": self.frame_seq,
+            "auto_inspect": self.auto_trigger is not None,
+        }
+
+
+class LabelDetector:
+    """
+    Owns the cameras and the single set of models; every camera's inspections run through the same
+    YOLO backend and RapidOCR engine, one at a time.
+    """
+
+    def __init__(self, cameras=None):
+        cameras = CAMERAS if cameras is None else cameras
+        self.cameras = OrderedDict((name, Camera(name, **config)) for name, config in cameras.items())
+        self.yolo_model = None
+        self.inference_lock = threading.Lock()
+        # Optional InferencePool: inspections then run in worker processes instead of this one
+        self.pool = None
+        # Optional ResultSink that persists every inspection off the request path
+        self.result_sink = None
+
+    def _get_yolo_model(self):
+        if self.yolo_model is None:
+            self.yolo_model = load_detector_backend()
+        return self.yolo_model
+
+    @property
+    def default_camera(self):
+        return next(iter(self.cameras.values()), None)
+
+    def camera(self, name=None):
+        """Return the named camera (the default one for None), or None if it is not configured."""
+        return self.default_camera if name is None else self.cameras.get(name)
+
+    def open_camera(self, name=None):
+        camera = self.camera(name)
+        if camera is None:
+            return {"success": False, "message": f"Unknown camera: {name}"}
+        with _camera_open_lock:
+            in_use = {other.device[0] for other in self.cameras.values() if other.device and other is not camera}
+            return camera.open(exclude=in_use)
+
+    def snapshot_frame(self, camera=None):
+        camera = self.camera(camera)
+        return camera.snapshot_frame() if camera is not None else None
+
+    def process_image(self, detection_mode=None, ocr_mode=None, frame=None, encode_image=True, source='api',
+                      camera=None, label_mode=None):
+        if frame is None:
+            frame = self.snapshot_frame(camera)
+        if frame is None:
             return {"success": False, "message": "No frame from camera to process"}
+        detection_mode = detection_mode or DETECTION_MODE
+        if detection_mode not in ('single', 'two_pass'):
+            return {"success": False, "message": f"Unknown detection mode: {detection_mode}"}
+        ocr_mode = ocr_mode or OCR_MODE
+        if ocr_mode not in ('global', 'recognition'):
+            return {"success": False, "message": f"Unknown OCR mode: {ocr_mode}"}
+        label_mode = label_mode or LABEL_MODE
+        if label_mode not in ('single', 'multi'):
+            return {"success": False, "message": f"Unknown label mode: {label_mode}"}
+        # Continuous mode inspects whatever settled in front of the camera; an empty fixture is not a defect
+        require_label = source == 'auto'
+        if self.pool is not None:
+            result = self.pool.inspect(frame, detection_mode, ocr_mode, camera, label_mode, require_label)
+            annotation = ANNOTATIONS.get(result.get("inspection_id"))
+            if encode_image and annotation is not None:
+                encode_start = time.perf_counter()
+                result["detection_image"] = base64.b64encode(annotation.jpeg()).decode("utf-8")
+                result["timings"]["encode_ms"] = round((time.perf_counter() - encode_start) * 1000, 1)
+        else:
+            # YOLO and RapidOCR are not thread-safe; in-process inspections run one at a time
+            with self.inference_lock:
+                result = self._process_frame(frame, detection_mode, ocr_mode, encode_image, camera, label_mode,
+                                             require_label)
+        record_inspection_metrics(result)
+        if camera is not None:
+            result["camera"] = camera
+        if result.get("status") == 'NO_LABEL':
+            source_camera = self.camera(camera)
+            trigger = source_camera.auto_trigger if source_camera is not None else None
+            if trigger is not None:
+                trigger.label_absent(frame)
+            return result
+        if self.result_sink is not None:
+            self.result_sink.submit(result, source, ANNOTATIONS.get(result.get("inspection_id")))
+        return result
+
+    def _localize(self, yolo, full_frame, camera=None):
+        """
+        Find the label: first in the ROI around this camera's last label box (at ROI_IMGSZ), then in the
+        full frame if it is not found there. Returns (detections in frame coordinates, label_type, box,
+        outcome) where outcome is 'hit', 'fallback' or 'full_frame'.
+        """
+        region = ROI_TRACKER.region(camera, full_frame.shape)
+        roi_seconds = None
+        if region is not None:
+            roi_start = time.perf_counter()
+            x1, y1, x2, y2 = region
+            results = yolo.predict(full_frame[y1:y2, x1:x2], imgsz=ROI_IMGSZ).translated(x1, y1)
+            label_type, box = find_label_box(results)
+            roi_seconds = time.perf_counter() - roi_start
+            if box is not None and ROI_TRACKER.contains(region, box, full_frame.shape):
+                return results, label_type, box, ROI_TRACKER.record(camera, box, roi_seconds=roi_seconds)
+
+        full_start = time.perf_counter()
+        results = yolo.predict(full_frame)
+        label_type, box = find_label_box(results)
+        outcome = ROI_TRACKER.record(camera, box, roi_seconds, time.perf_counter() - full_start)
+        return results, label_type, box, outcome
+
+    def _process_frame(self, full_frame, detection_mode, ocr_mode, encode_image, camera=None, label_mode='single',
+                       require_label=False):
+        if label_mode == 'multi':
+            return self._process_labels(full_frame, detection_mode, ocr_mode, encode_image, camera, require_label)
+        inspection_start = time.perf_counter()
         try:
             yolo = self._get_yolo_model()
-            full_frame = self.latest_frame.copy()
 
             # Auto-crop logic also determines the label_type
-            results = yolo(full_frame, verbose=False)[0]
-            inside_box, outside_box = None, None
-            inside_conf, outside_conf = 0.0, 0.0
-            for box in results.boxes:
-                class_name = results.names[int(box.cls[0])].lower()
-                confidence = float(box.conf[0])
-                if class_name == 'inside' and confidence > inside_conf:
-                    inside_box = box.xyxy[0].cpu().numpy().astype(int)
-                    inside_conf = confidence
-                elif class_name == 'outside' and confidence > outside_conf:
-                    outside_box = box.xyxy[0].cpu().numpy().astype(int)
-                    outside_conf = confidence
-           
-            crop_box, label_type = None, 'inside'
-            if inside_box is not None:
-                crop_box, label_type = inside_box, 'inside'
-            elif outside_box is not None:
-                crop_box, label_type = outside_box, 'outside'
-            else:
+            detector_start = time.perf_counter()
+            results, label_type, crop_box, localization = self._localize(yolo, full_frame, camera)
+            crop_detection_time = time.perf_counter() - detector_start
+            field_detection_time = 0.0
+            if crop_box is None and require_label:
+                return no_label_result('single', crop_detection_time, inspection_start)
+            if crop_box is None:
                 # Jika tidak ada box 'inside' atau 'outside' terdeteksi, default ke 'inside' dan proses seluruh gambar
                 print("Peringatan: Tidak ada box 'inside'/'outside' terdeteksi. Memproses seluruh frame sebagai 'inside'.")
-                label_type = 'inside' 
-           
+                label_type = 'inside'
+
             cropped_frame = full_frame
             if crop_box is not None:
                 x1, y1, x2, y2 = crop_box
-                cropped_frame = full_frame[max(0, y1):min(full_frame.shape[0], y2), max(0, x1):min(full_frame.shape[1], x2)]
+                crop_box = (max(0, x1), max(0, y1), min(full_frame.shape[1], x2), min(full_frame.shape[0], y2))
+                cropped_frame = full_frame[crop_box[1]:crop_box[3], crop_box[0]:crop_box[2]]
 
             if cropped_frame.size == 0:
                 return {"success": False, "message": "Auto-crop failed."}
+
+            if detection_mode == 'single':
+                # Pakai ulang deteksi field dari pass pertama, diterjemahkan ke koordinat crop
+                field_boxes = collect_field_boxes(results, crop_box)
+            else:
+                detector_start = time.perf_counter()
+                field_boxes = collect_field_boxes(yolo.predict(cropped_frame))
+                field_detection_time = time.perf_counter() - detector_start
            
             # Jalankan fungsi deteksi/verifikasi yang baru
-            output_image, status, matched_results, defect_results = run_detection_and_verification(
+            timings = {
+                'crop_detection_ms': round(crop_detection_time * 1000, 1),
+                'field_detection_ms': round(field_detection_time * 1000, 1),
+                'detector_ms': round((crop_detection_time + field_detection_time) * 1000, 1),
+            }
+            objects, status, matched_results, defect_results = run_detection_and_verification(
                 image=cropped_frame,
                 yolo_model=yolo,
-                label_type=label_type
+                label_type=label_type,
+                field_boxes=field_boxes,
+                ocr_mode=ocr_mode,
+                timings=timings
             )
-           
-            _, buffer = cv2.imencode(".jpg", output_image)
-            encoded_string = base64.b64encode(buffer).decode("utf-8")
+
+            # Copy: a slice would keep the whole camera frame alive in the annotation cache
+            inspection_id = uuid.uuid4().hex
+            annotation = Annotation(cropped_frame.copy(), objects, status, crop_box)
+            ANNOTATIONS.put(inspection_id, annotation)
+            encoded_string = None
+            if encode_image:
+                encode_start = time.perf_counter()
+                encoded_string = base64.b64encode(annotation.jpeg()).decode("utf-8")
+                timings['encode_ms'] = round((time.perf_counter() - encode_start) * 1000, 1)
 
             # Tambahkan tipe label yang terdeteksi ke awal list matched_results
             matched_results.insert(0, {
@@ -469,49 +2322,1400 @@ class LabelDetector:
                 'ocr_value': label_type.upper()
             })
 
+            ocr_fallbacks = timings.pop('ocr_fallbacks', 0)
+            timings['total_ms'] = round((time.perf_counter() - inspection_start) * 1000, 1)
+
             return {
                 "success": True,
+                "inspection_id": inspection_id,
                 "detection_image": encoded_string,
+                "detection_image_url": f"/api/inspections/{inspection_id}/image",
+                "annotation": annotation.geometry(),
                 "status": status,
+                "label_mode": 'single',
+                "label_type": label_type,
+                "partcode": result_partcode(matched_results, defect_results),
                 "matched_results": matched_results,
-                "defect_results": defect_results
+                "defect_results": defect_results,
+                "detection_mode": detection_mode,
+                "ocr_mode": ocr_mode,
+                "ocr_fallbacks": ocr_fallbacks,
+                "localization": localization,
+                "timings": timings
             }
         except Exception as e:
             import traceback
             traceback.print_exc()
             return {"success": False, "message": f"An error occurred: {str(e)}"}
 
+    def _process_labels(self, full_frame, detection_mode, ocr_mode, encode_image, camera=None, require_label=False):
+        """
+        'multi' label mode: inspect every label in the frame. The field detection pass ('two_pass'), the
+        recognition OCR and the master data lookup each run once for all labels instead of once per label.
+        """
+        inspection_start = time.perf_counter()
+        try:
+            yolo = self._get_yolo_model()
+
+            detector_start = time.perf_counter()
+            results = yolo.predict(full_frame)
+            labels = find_label_boxes(results)
+            crop_detection_time = time.perf_counter() - detector_start
+            if not labels and require_label:
+                return no_label_result('multi', crop_detection_time, inspection_start)
+            if not labels:
+                print("Peringatan: Tidak ada box 'inside'/'outside' terdeteksi. Memproses seluruh frame sebagai 'inside'.")
+                labels = [('inside', np.array([0, 0, full_frame.shape[1], full_frame.shape[0]]), None)]
+
+            frame_h, frame_w = full_frame.shape[:2]
+            crop_boxes, crops = [], []
+            for _, (x1, y1, x2, y2), _ in labels:
+                crop_box = (max(0, int(x1)), max(0, int(y1)), min(frame_w, int(x2)), min(frame_h, int(y2)))
+                crop_boxes.append(crop_box)
+                crops.append(full_frame[crop_box[1]:crop_box[3], crop_box[0]:crop_box[2]])
+            if any(crop.size == 0 for crop in crops):
+                return {"success": False, "message": "Auto-crop failed."}
+
+            field_detection_time = 0.0
+            if detection_mode == 'single':
+                field_boxes = [collect_field_boxes(results, crop_box) for crop_box in crop_boxes]
+            else:
+                detector_start = time.perf_counter()
+                field_boxes = [collect_field_boxes(detections) for detections in yolo.predict_batch(crops)]
+                field_detection_time = time.perf_counter() - detector_start
+            field_boxes = [sorted(boxes, key=reading_order) for boxes in field_boxes]
+
+            timings = {
+                'crop_detection_ms': round(crop_detection_time * 1000, 1),
+                'field_detection_ms': round(field_detection_time * 1000, 1),
+                'detector_ms': round((crop_detection_time + field_detection_time) * 1000, 1),
+            }
+
+            # Satu panggilan recognizer untuk field teks semua label
+            rec_results = [None] * len(labels)
+            if ocr_mode == 'recognition':
+                ocr_start = time.perf_counter()
+                rec_results = recognize_label_fields([
+                    (crop, [box for box in boxes if box['class_name'] not in LOGO_CLASSES])
+                    for crop, boxes in zip(crops, field_boxes)
+                ])
+                timings['recognition_ocr_ms'] = round((time.perf_counter() - ocr_start) * 1000, 1)
+
+            label_objects, ocr_fallbacks = [], 0
+            for crop, boxes, rec_result in zip(crops, field_boxes, rec_results):
+                label_timings = {}
+                label_objects.append(read_label_fields(crop, boxes, ocr_mode, label_timings, rec_result))
+                ocr_fallbacks += label_timings.pop('ocr_fallbacks', 0)
+                label_timings.pop('recognition_ocr_ms', None)
+                for stage, duration_ms in label_timings.items():
+                    timings[stage] = round(timings.get(stage, 0.0) + duration_ms, 1)
+
+            # Master data semua partcode dalam satu query per tipe label
+            verification_start = time.perf_counter()
+            keys = []
+            for (label_type, _, _), objects in zip(labels, label_objects):
+                partcode_data = find_partcode_object(objects)
+                if partcode_data and normalize_partcode(partcode_data.get('text')):
+                    keys.append((partcode_data['text'], label_type))
+            try:
+                templates = MASTER_DATA.get_templates(keys)
+            except pyodbc.Error as error:
+                print(f"Peringatan: Query master data gabungan gagal: {error}")
+                templates = None  # Each label retries on its own and reports the error
+
+            label_results = []
+            for index, ((label_type, box, confidence), objects) in enumerate(zip(labels, label_objects), start=1):
+                status, matched_results, defect_results = verify_label_completeness(objects, label_type, templates)
+                matched_results.insert(0, {
+                    'item': 'Label Type',
+                    'db_value': 'N/A (Auto-Detected)',
+                    'ocr_value': label_type.upper()
+                })
+                label_results.append({
+                    "label": index,
+                    "label_type": label_type,
+                    "box": [int(v) for v in box],
+                    "confidence": round(float(confidence), 4) if confidence is not None else None,
+                    "status": status,
+                    "partcode": result_partcode(matched_results, defect_results),
+                    "matched_results": matched_results,
+                    "defect_results": defect_results,
+                })
+            timings['verification_ms'] = round((time.perf_counter() - verification_start) * 1000, 1)
+
+            statuses = {label["status"] for label in label_results}
+            status = 'ERROR' if 'ERROR' in statuses else 'DEFECT' if 'DEFECT' in statuses else 'OK'
+
+            # One annotated image around all labels: label boxes with their status, plus their fields
+            union_box = (min(box[0] for box in crop_boxes), min(box[1] for box in crop_boxes),
+                         max(box[2] for box in crop_boxes), max(box[3] for box in crop_boxes))
+            ux, uy = union_box[:2]
+            annotation_objects = []
+            for label, crop_box, objects in zip(label_results, crop_boxes, label_objects):
+                x1, y1, x2, y2 = crop_box
+                annotation_objects.append({
+                    'class_name': f"#{label['label']} {label['label_type']}", 'text': label['status'],
+                    'coords': [x1 - ux, y1 - uy, x2 - ux, y2 - uy],
+                })
+                for obj in objects:
+                    ox1, oy1, ox2, oy2 = obj['coords']
+                    annotation_objects.append(dict(obj, coords=[ox1 + x1 - ux, oy1 + y1 - uy, ox2 + x1 - ux, oy2 + y1 - uy]))
+
+            inspection_id = uuid.uuid4().hex
+            annotation = Annotation(full_frame[union_box[1]:union_box[3], union_box[0]:union_box[2]].copy(),
+                                    annotation_objects, status, union_box)
+            ANNOTATIONS.put(inspection_id, annotation)
+            encoded_string = None
+            if encode_image:
+                encode_start = time.perf_counter()
+                encoded_string = base64.b64encode(annotation.jpeg()).decode("utf-8")
+                timings['encode_ms'] = round((time.perf_counter() - encode_start) * 1000, 1)
+
+            timings['total_ms'] = round((time.perf_counter() - inspection_start) * 1000, 1)
+            timings['per_label_ms'] = round(timings['total_ms'] / len(label_results), 1)
+
+            partcodes = [label["partcode"] for label in label_results if label["partcode"]]
+            return {
+                "success": True,
+                "inspection_id": inspection_id,
+                "detection_image": encoded_string,
+                "detection_image_url": f"/api/inspections/{inspection_id}/image",
+                "annotation": annotation.geometry(),
+                "status": status,
+                "label_mode": 'multi',
+                "label_count": len(label_results),
+                "label_type": ",".join(sorted({label["label_type"] for label in label_results})),
+                "partcode": ",".join(dict.fromkeys(partcodes)) or None,
+                # Flattened for clients that show a single list; each item names its label
+                "matched_results": [dict(item, label=label["label"]) for label in label_results
+                                    for item in label["matched_results"]],
+                "defect_results": [dict(item, label=label["label"]) for label in label_results
+                                   for item in label["defect_results"]],
+                "labels": label_results,
+                "detection_mode": detection_mode,
+                "ocr_mode": ocr_mode,
+                "ocr_fallbacks": ocr_fallbacks,
+                "localization": 'full_frame',
+                "timings": timings
+            }
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return {"success": False, "message": f"An error occurred: {str(e)}"}
+
+
+class InspectionJob:
+    """A single queued inspection of a snapshotted frame."""
+
+    def __init__(self, frame, detection_mode=None, ocr_mode=None, source='job', camera=None, label_mode=None,
+                 priority=False):
+        self.id = uuid.uuid4().hex
+        self.frame = frame
+        self.source = source
+        self.priority = priority
+        self.camera = camera
+        self.detection_mode = detection_mode
+        self.ocr_mode = ocr_mode
+        self.label_mode = label_mode
+        self.state = 'queued'  # queued -> running -> done | failed | cancelled | dropped
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.finished = threading.Event()
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "camera": self.camera,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.state in ('done', 'failed'):
+            job["result"] = self.result
+        return job
+
+
+class InspectionQueue:
+    """
+    Shared inference scheduler: one bounded FIFO of inspection jobs per camera, served round-robin
+    by background worker threads so a busy conveyor cannot starve the others. Priority jobs (an
+    operator waiting on /api/process) skip the per-camera queues: they are served first, never
+    count against the depth and are never dropped.
+    """
+
+    def __init__(self, label_detector, depth=JOB_QUEUE_DEPTH, policy=JOB_QUEUE_POLICY, workers=JOB_WORKERS):
+        self.detector = label_detector
+        self.depth = depth
+        self.policy = policy
+        self._pending = OrderedDict()  # camera -> deque of jobs; the head camera is served next
+        self._priority = deque()
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self.add_workers(workers)
+
+    def add_workers(self, count):
+        for _ in range(count):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, frame, detection_mode=None, ocr_mode=None, source='job', camera=None, label_mode=None,
+               priority=False):
+        """Queue a job; returns (job, None) or (None, reason) when that camera's queue is full."""
+        job = InspectionJob(frame, detection_mode, ocr_mode, source, camera, label_mode, priority)
+        with self._cond:
+            pending = self._priority if priority else self._pending.setdefault(camera, deque())
+            if not priority and len(pending) >= self.depth:
+                if self.policy != 'drop_oldest':
+                    return None, "Inspection queue is full"
+                dropped = pending.popleft()
+                self._finish(dropped, 'dropped')
+            pending.append(job)
+            self._remember(job)
+            self._cond.notify()
+        return job, None
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        with self._cond:
+            try:
+                return self._queue_of(job).index(job)
+            except ValueError:
+                return None
+
+    def cancel(self, job_id):
+        """Cancel a queued job; a running job finishes but its result is discarded."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state == 'queued':
+                self._queue_of(job).remove(job)
+                self._finish(job, 'cancelled')
+            elif job.state == 'running':
+                job.cancel_requested = True
+            return job
+
+    def stats(self):
+        with self._cond:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "queued": sum(len(pending) for pending in self._pending.values()) + len(self._priority),
+                "queued_priority": len(self._priority),
+                "queued_per_camera": {str(camera): len(pending) for camera, pending in self._pending.items()},
+                "depth": self.depth,
+                "policy": self.policy,
+                "jobs": states,
+            }
+
+    def _queue_of(self, job):
+        return self._priority if job.priority else self._pending.get(job.camera, deque())
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE + self.depth * max(1, len(self._pending)):
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id].state in ('queued', 'running'):
+                break
+            del self._jobs[oldest_id]
+
+    def _finish(self, job, state, result=None):
+        job.state = state
+        job.result = result
+        job.frame = None
+        job.finished_at = time.time()
+        job.finished.set()
+
+    def _next_job(self):
+        if self._priority:
+            return self._priority.popleft()
+        # Round-robin: take from the first camera with work, then move it behind the others
+        for camera, pending in self._pending.items():
+            if pending:
+                self._pending.move_to_end(camera)
+                return pending.popleft()
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                job.state = 'running'
+                job.started_at = time.time()
+            state, result = 'failed', None
+            try:
+                # The annotated image is rendered later, only if a client asks for it
+                result = self.detector.process_image(job.detection_mode, job.ocr_mode, frame=job.frame,
+                                                     encode_image=False, source=job.source, camera=job.camera,
+                                                     label_mode=job.label_mode)
+                state = 'cancelled' if job.cancel_requested else 'done'
+            except Exception as e:
+                # A failing job must not take the worker (and every job queued behind it) down with it
+                import traceback
+                traceback.print_exc()
+                result = {"success": False, "message": f"An error occurred: {str(e)}"}
+            finally:
+                with self._cond:
+                    self._finish(job, state, result)
+
+# --- STARTUP & WARM-UP ---
+class StartupState:
+    """Load state and duration of each startup component, reported by /api/health and /api/ready."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._components = OrderedDict()
+        self._required = set()
+
+    def expect(self, name, required=True):
+        """Declare a component that has yet to load; required ones gate readiness."""
+        with self._lock:
+            self._components[name] = {"state": "pending"}
+            if required:
+                self._required.add(name)
+
+    @contextmanager
+    def stage(self, name):
+        with self._lock:
+            self._components[name] = {"state": "loading"}
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self._components[name] = {"state": "failed", "seconds": round(time.perf_counter() - start, 3),
+                                          "error": str(e)}
+            raise
+        with self._lock:
+            self._components[name] = {"state": "ready", "seconds": round(time.perf_counter() - start, 3)}
+
+    def snapshot(self):
+        with self._lock:
+            components = {name: dict(info) for name, info in self._components.items()}
+            required = [components[name]["state"] for name in self._required]
+        return {
+            "ready": all(state == "ready" for state in required),
+            "failed": any(state == "failed" for state in required),
+            "uptime_s": round(time.time() - self.started, 1),
+            "components": components,
+        }
+
+
+STARTUP = StartupState()
+
+# Python package imported by each detector backend
+DETECTOR_BACKEND_PACKAGES = {'pytorch': "ultralytics", 'onnxruntime': "onnxruntime", 'openvino': "openvino"}
+
+def warm_up(label_detector):
+    """
+    Load the detector backend and RapidOCR and run them once on a synthetic label, so the first real
+    inspection does not pay for imports, model loading or first-inference allocations.
+    """
+    with STARTUP.stage("detector"):
+        importlib.import_module(DETECTOR_BACKEND_PACKAGES.get(DETECTOR_BACKEND, "ultralytics"))
+        with label_detector.inference_lock:
+            yolo = label_detector._get_yolo_model()
+    with STARTUP.stage("ocr_engine"):
+        engine = get_ocr_engine()
+    with STARTUP.stage("warmup"):
+        dummy = np.full((480, 640, 3), 255, dtype=np.uint8)
+        cv2.putText(dummy, "WARMUP 0123", (40, 250), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 0, 0), 4)
+        line = dummy[190:270, 30:560]
+        line = cv2.resize(line, (round(line.shape[1] * OCR_REC_HEIGHT / line.shape[0]), OCR_REC_HEIGHT))
+        # Straight to the models: the warm-up must not leave entries in the OCR cache or ROI tracker
+        with label_detector.inference_lock:
+            yolo.predict(dummy)
+            if ROI_TRACKING:
+                yolo.predict(dummy, imgsz=ROI_IMGSZ)
+            engine(dummy)
+            engine.text_rec([line])
+
+def _start_up(label_detector):
+    """
+    Background startup stage of the server; Flask is already accepting requests meanwhile. Failures are
+    reported by /api/ready and their tracebacks go to stderr, where the Electron shell watches for them.
+    """
+    import traceback
+    try:
+        with STARTUP.stage("sql_driver"):
+            pyodbc.load()
+    except ImportError as e:
+        traceback.print_exc()
+        print(f"Peringatan: Driver SQL Server gagal dimuat: {e}")
+    try:
+        if label_detector.pool is not None:
+            with STARTUP.stage("inference_workers"):
+                label_detector.pool.wait_ready()
+        else:
+            warm_up(label_detector)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"Peringatan: Startup gagal: {e}")
+        return
+    if MASTER_DATA_PREFETCH and label_detector.pool is None:
+        try:
+            with STARTUP.stage("master_data"):
+                MASTER_DATA.start_prefetch()
+        except pyodbc.Error as error:
+            print(f"Peringatan: Prefetch master data gagal: {error}")
+    print(f"Backend siap dalam {STARTUP.snapshot()['uptime_s']} s")
+
+
+# --- WORKER INFERENSI (PROSES TERPISAH) ---
+def _attach_shared_memory(name):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+: the server owns the segment
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def _apply_worker_settings(settings, seen):
+    """Follow the server's runtime toggles; a changed generation means the server cleared its copy."""
+    OCR_CACHE.enabled = settings["ocr_cache"]
+    ROI_TRACKER.enabled = settings["roi_tracking"]
+    resets = {
+        "ocr_cache_generation": OCR_CACHE.clear,
+        "roi_generation": ROI_TRACKER.reset,
+        "master_data_generation": MASTER_DATA.invalidate,
+    }
+    for key, reset in resets.items():
+        if seen.get(key, settings[key]) != settings[key]:
+            reset()
+        seen[key] = settings[key]
+
+def _prefetch_master_data():
+    try:
+        pyodbc.load()
+        MASTER_DATA.start_prefetch()
+    except ImportError as e:
+        print(f"Peringatan: Driver SQL Server gagal dimuat: {e}")
+    except pyodbc.Error as error:
+        print(f"Peringatan: Prefetch master data gagal: {error}")
+
+def _inference_worker_main(conn, slot_names, threads):
+    """Entry point of an inference worker process (see InferencePool)."""
+    cv2.setNumThreads(threads)
+    slots = [_attach_shared_memory(name) for name in slot_names]
+    worker = LabelDetector(cameras={})
+    worker.yolo_model = load_detector_backend(threads=threads)
+    warm_up(worker)
+    if MASTER_DATA_PREFETCH:
+        # The workers do the lookups, so each one holds the prefetched rows; loaded while jobs already run
+        threading.Thread(target=_prefetch_master_data, daemon=True).start()
+    seen = {}
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break  # The server process is gone
+        if task is None:
+            break
+        slot, shape, dtype, inline_frame, detection_mode, ocr_mode, camera, label_mode, require_label, settings = task
+        _apply_worker_settings(settings, seen)
+        frame = inline_frame if inline_frame is not None else np.ndarray(shape, dtype, buffer=slots[slot].buf)
+        result = worker._process_frame(frame, detection_mode, ocr_mode, False, camera, label_mode, require_label)
+        del frame
+        # The label crop goes back through the same slot; the server renders the annotated image from it
+        crop = None
+        annotation = ANNOTATIONS.pop(result.get("inspection_id"))
+        if annotation is not None:
+            image = annotation.image
+            if inline_frame is None and image.nbytes <= slots[slot].size:
+                np.ndarray(image.shape, image.dtype, buffer=slots[slot].buf)[...] = image
+                crop = (image.shape, image.dtype.str)
+            else:
+                crop = image
+        # The server reports these components and metrics for the workers (see InferencePool.component_stats)
+        stats = {"ocr_cache": OCR_CACHE.stats(), "roi_tracker": ROI_TRACKER.stats(), "master_data": MASTER_DATA.stats()}
+        conn.send((result, crop, stats, METRICS.snapshot()))
+    for shm in slots:
+        shm.close()
+
+
+class InferenceWorker:
+    """Server-side handle of one inference worker process."""
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pid = None
+        self.state = 'starting'  # starting -> idle <-> busy; failed if the process dies
+        self.jobs = 0
+        self.stats = None
+
+    def to_dict(self):
+        return dict({"index": self.index, "pid": self.pid, "state": self.state, "jobs": self.jobs}, **(self.stats or {}))
+
+
+class InferencePool:
+    """
+    Inference worker processes, each with its own detector backend and RapidOCR engine, so concurrent
+    inspections neither share model state nor contend on the GIL.
+
+    Frames are copied into a ring of shared-memory slots and workers only receive the slot index and
+    shape; the worker writes the label crop back into the same slot. Jobs go to an idle worker,
+    preferring the one that last served the same camera (its ROI tracker and OCR cache are warm).
+    """
+
+    def __init__(self, processes=INFERENCE_PROCESSES, threads=None):
+        from multiprocessing import get_context, shared_memory
+        self._context = get_context("spawn")
+        self.processes = processes
+        self.threads = threads or DETECTOR_THREADS or max(1, (os.cpu_count() or 1) // processes)
+        self.slot_bytes = INFERENCE_SLOT_MB * 1024 * 1024
+        self.slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                      for _ in range(processes * INFERENCE_SLOTS_PER_WORKER)]
+        self._free_slots = deque(range(len(self.slots)))
+        self._workers = []
+        self._idle = deque()
+        self._camera_worker = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        for index in range(processes):
+            self._workers.append(self._start_worker(index))
+        atexit.register(self.close)
+
+    def _start_worker(self, index):
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_inference_worker_main, args=(child_conn, [shm.name for shm in self.slots], self.threads),
+            name=f"inference-{index}", daemon=True)
+        process.start()
+        child_conn.close()
+        worker = InferenceWorker(index, process, conn)
+        threading.Thread(target=self._await_ready, args=(worker,), daemon=True).start()
+        return worker
+
+    def _await_ready(self, worker):
+        # Loading the models takes a while; the worker only takes jobs once it reports ready
+        try:
+            _, worker.pid = worker.conn.recv()
+        except (EOFError, OSError):
+            print(f"Peringatan: Worker inferensi {worker.index} gagal dimulai.")
+            with self._cond:
+                worker.state = 'failed'
+                self._cond.notify_all()
+            return
+        with self._cond:
+            worker.state = 'idle'
+            self._idle.append(worker)
+            self._cond.notify_all()
+
+    def wait_ready(self):
+        """Block until every worker has loaded its models; raises if none of them could start."""
+        with self._cond:
+            while any(worker.state == 'starting' for worker in self._workers):
+                self._cond.wait()
+            if all(worker.state == 'failed' for worker in self._workers):
+                raise RuntimeError("No inference worker could start")
+
+    def _acquire(self, camera):
+        """Wait for a free slot and an idle worker; returns (slot, worker) or (None, None) if none can start."""
+        with self._cond:
+            while not self._free_slots or not self._idle:
+                if all(worker.state == 'failed' for worker in self._workers):
+                    return None, None
+                self._cond.wait(timeout=1.0)
+            slot = self._free_slots.popleft()
+            worker = self._camera_worker.get(camera)
+            if worker in self._idle:
+                self._idle.remove(worker)
+            else:
+                worker = self._idle.popleft()
+            worker.state = 'busy'
+            self._camera_worker[camera] = worker
+            return slot, worker
+
+    def _release(self, slot, worker=None):
+        with self._cond:
+            self._free_slots.append(slot)
+            if worker is not None and worker.state == 'busy':
+                worker.state = 'idle'
+                self._idle.append(worker)
+            self._cond.notify_all()
+
+    def _restart(self, worker):
+        print(f"Peringatan: Worker inferensi {worker.index} berhenti, dimulai ulang.")
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.conn.close()
+        with self._cond:
+            worker.state = 'failed'
+            if not self._closed:
+                self._workers[worker.index] = self._start_worker(worker.index)
+
+    def inspect(self, frame, detection_mode, ocr_mode, camera=None, label_mode='single', require_label=False):
+        slot, worker = self._acquire(camera)
+        if worker is None:
+            return {"success": False, "message": "No inference worker available"}
+        buffer = self.slots[slot].buf
+        # Frames larger than a slot (unusual camera resolutions) are sent through the pipe instead
+        inline = frame.nbytes > self.slot_bytes
+        if not inline:
+            np.ndarray(frame.shape, frame.dtype, buffer=buffer)[...] = frame
+        try:
+            worker.conn.send((slot, frame.shape, frame.dtype.str, frame if inline else None,
+                              detection_mode, ocr_mode, camera, label_mode, require_label, self._settings()))
+            result, crop, worker.stats, metrics = worker.conn.recv()
+        except (EOFError, OSError):
+            self._restart(worker)
+            self._release(slot)
+            return {"success": False, "message": f"Inference worker {worker.index} stopped unexpectedly"}
+        worker.jobs += 1
+        METRICS.set_remote(f"inference-{worker.index}", metrics)
+        if crop is not None and not isinstance(crop, np.ndarray):
+            shape, dtype = crop
+            crop = np.ndarray(shape, dtype, buffer=buffer).copy()
+        self._release(slot, worker)
+        if crop is not None and result.get("success"):
+            geometry = result["annotation"]
+            ANNOTATIONS.put(result["inspection_id"],
+                            Annotation(crop, geometry["boxes"], result["status"], geometry["crop_box"]))
+        return result
+
+    def _settings(self):
+        return {
+            "ocr_cache": OCR_CACHE.enabled,
+            "ocr_cache_generation": OCR_CACHE.generation,
+            "roi_tracking": ROI_TRACKER.enabled,
+            "roi_generation": ROI_TRACKER.generation,
+            "master_data_generation": MASTER_DATA.generation,
+        }
+
+    def component_stats(self, name, local):
+        """
+        Stats of a per-process component ('ocr_cache', 'roi_tracker', 'master_data') merged over the workers,
+        which run the inspections, as of each worker's last job; local's until a worker has reported.
+        """
+        with self._cond:
+            reported = [worker.stats[name] for worker in self._workers if worker.stats]
+        return merge_stats(reported) if reported else local.stats()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "processes": self.processes,
+                "threads_per_worker": self.threads,
+                "slots": len(self.slots),
+                "free_slots": len(self._free_slots),
+                "idle": len(self._idle),
+                "workers": [worker.to_dict() for worker in self._workers],
+            }
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+        for shm in self.slots:
+            shm.close()
+            shm.unlink()
+
+
+class ResultSink:
+    """
+    Persists inspection results to a local SQLite database (WAL mode) from a background writer
+    thread, with batched commits, retention limits and an optional batched, retrying upload to
+    SQL Server. submit() never blocks: when the queue is full the record is dropped.
+    """
+
+    def __init__(self, directory=RESULT_STORE_DIR):
+        self.directory = directory
+        self.db_path = os.path.join(directory, "inspections.db")
+        self.image_dir = os.path.join(directory, "images")
+        self._queue = queue.Queue(maxsize=RESULT_QUEUE_SIZE)
+        self.upload_error = None
+
+    def start(self):
+        os.makedirs(self.image_dir, exist_ok=True)
+        conn = self._connect()
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS inspections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                inspection_id TEXT UNIQUE,
+                inspected_at REAL NOT NULL,
+                source TEXT,
+                camera TEXT,
+                success INTEGER NOT NULL,
+                partcode TEXT,
+                label_type TEXT,
+                status TEXT,
+                message TEXT,
+                matched_json TEXT,
+                defects_json TEXT,
+                timings_json TEXT,
+                image_path TEXT,
+                uploaded INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_inspections_inspected_at ON inspections (inspected_at);
+            CREATE INDEX IF NOT EXISTS idx_inspections_uploaded ON inspections (uploaded, id);
+        """)
+        # Databases created before multi-camera support lack the camera column
+        if "camera" not in {row[1] for row in conn.execute("PRAGMA table_info(inspections)")}:
+            conn.execute("ALTER TABLE inspections ADD COLUMN camera TEXT")
+        conn.close()
+        threading.Thread(target=self._writer, daemon=True).start()
+        if RESULT_UPLOAD_ENABLED:
+            threading.Thread(target=self._uploader, daemon=True).start()
+        return self
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, result, source='api', annotation=None):
+        """Queue a result; the annotated image (if saved) is rendered from annotation by the writer thread."""
+        try:
+            self._queue.put_nowait((time.time(), source, result, annotation))
+        except queue.Full:
+            RESULT_RECORDS_TOTAL.inc(outcome="dropped")
+
+    def _save_image(self, inspected_at, inspection_id, jpeg):
+        day_dir = os.path.join(self.image_dir, time.strftime("%Y%m%d", time.localtime(inspected_at)))
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, f"{inspection_id}.jpg")
+        with open(path, "wb") as f:
+            f.write(jpeg)
+        return path
+
+    def _to_row(self, inspected_at, source, result, annotation=None):
+        inspection_id = result.get("inspection_id") or uuid.uuid4().hex
+        image_path = None
+        if RESULT_SAVE_IMAGES and (annotation is not None or result.get("detection_image")):
+            try:
+                jpeg = annotation.jpeg() if annotation is not None else base64.b64decode(result["detection_image"])
+                image_path = self._save_image(inspected_at, inspection_id, jpeg)
+            except OSError as e:
+                print(f"Peringatan: Gagal menyimpan gambar hasil: {e}")
+        return (
+            inspection_id, inspected_at, source, result.get("camera"), int(bool(result.get("success"))),
+            result.get("partcode"), result.get("label_type"), result.get("status"), result.get("message"),
+            json.dumps(result.get("matched_results", []), default=str),
+            json.dumps(result.get("defect_results", []), default=str),
+            json.dumps(result.get("timings", {})),
+            image_path,
+        )
+
+    def _writer(self):
+        conn = self._connect()
+        last_retention = 0.0
+        while True:
+            batch = []
+            deadline = time.monotonic() + RESULT_FLUSH_INTERVAL
+            while len(batch) < RESULT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    rows = [self._to_row(*record) for record in batch]
+                    with conn:
+                        conn.executemany("""
+                            INSERT OR IGNORE INTO inspections (
+                                inspection_id, inspected_at, source, camera, success, partcode, label_type,
+                                status, message, matched_json, defects_json, timings_json, image_path
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, rows)
+                    RESULT_RECORDS_TOTAL.inc(len(rows), outcome="stored")
+                except sqlite3.Error as e:
+                    RESULT_RECORDS_TOTAL.inc(len(batch), outcome="failed")
+                    print(f"Peringatan: Gagal menulis hasil inspeksi: {e}")
+            if time.monotonic() - last_retention > 3600:
+                last_retention = time.monotonic()
+                self._apply_retention(conn)
+
+    def _apply_retention(self, conn):
+        cutoff = time.time() - RESULT_RETENTION_DAYS * 86400
+        try:
+            with conn:
+                if RESULT_UPLOAD_ENABLED:
+                    # Keep rows that have not reached SQL Server yet; failed inspections are never uploaded
+                    conn.execute("DELETE FROM inspections WHERE inspected_at < ? AND (uploaded = 1 OR success = 0)",
+                                 (cutoff,))
+                else:
+                    conn.execute("DELETE FROM inspections WHERE inspected_at < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"Peringatan: Retensi hasil inspeksi gagal: {e}")
+
+        # Image folders are per day: drop expired days, then the oldest days beyond the size cap
+        cutoff_day = time.strftime("%Y%m%d", time.localtime(cutoff))
+        try:
+            day_dirs = sorted(d for d in os.listdir(self.image_dir) if os.path.isdir(os.path.join(self.image_dir, d)))
+            sizes = {}
+            for day in day_dirs:
+                day_path = os.path.join(self.image_dir, day)
+                sizes[day] = sum(os.path.getsize(os.path.join(day_path, f)) for f in os.listdir(day_path))
+            total = sum(sizes.values())
+            for day in day_dirs[:-1]:  # Never remove the current day
+                if day >= cutoff_day and total <= RESULT_MAX_IMAGE_MB * 1024 * 1024:
+                    break
+                shutil.rmtree(os.path.join(self.image_dir, day), ignore_errors=True)
+                total -= sizes[day]
+        except OSError as e:
+            # Must not end the writer thread, or every later record would be dropped
+            print(f"Peringatan: Retensi gambar hasil gagal: {e}")
+
+    def _uploader(self):
+        conn = self._connect()
+        pool = SQLConnectionPool(SQL_SERVER_CONN_STR, max_size=1)
+        station = socket.gethostname()
+        delay = RESULT_UPLOAD_INTERVAL
+        while True:
+            time.sleep(delay)
+            try:
+                rows = conn.execute("""
+                    SELECT id, inspection_id, inspected_at, source, partcode, label_type, status,
+                           matched_json, defects_json, timings_json, image_path
+                    FROM inspections WHERE uploaded = 0 AND success = 1 ORDER BY id LIMIT ?
+                """, (RESULT_UPLOAD_BATCH_SIZE,)).fetchall()
+                if not rows:
+                    delay = RESULT_UPLOAD_INTERVAL
+                    continue
+                params = [
+                    (row[1], station, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[2]))) + tuple(row[3:])
+                    for row in rows
+                ]
+                with pool.connection() as server:
+                    cur = server.cursor()
+                    cur.fast_executemany = True
+                    cur.executemany(RESULT_UPLOAD_QUERY, params)
+                    server.commit()
+                with conn:
+                    conn.executemany("UPDATE inspections SET uploaded = 1 WHERE id = ?", [(row[0],) for row in rows])
+                RESULT_RECORDS_TOTAL.inc(len(rows), outcome="uploaded")
+                self.upload_error = None
+                # More rows may be waiting: continue without the full pause
+                delay = 1 if len(rows) == RESULT_UPLOAD_BATCH_SIZE else RESULT_UPLOAD_INTERVAL
+            except (pyodbc.Error, sqlite3.Error) as e:
+                self.upload_error = str(e)
+                delay = min(delay * 2, 1800)
+                print(f"Peringatan: Upload hasil inspeksi gagal, dicoba lagi dalam {delay} detik: {e}")
+
+    def stats(self):
+        stats = {"queued": self._queue.qsize(), "db_path": self.db_path, "upload_enabled": RESULT_UPLOAD_ENABLED,
+                 "upload_error": self.upload_error}
+        try:
+            conn = self._connect()
+            try:
+                stats["stored"], stats["pending_upload"] = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(uploaded = 0 AND success = 1), 0) FROM inspections").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            stats["error"] = str(e)
+        return stats
+
 # --- ROUTE API FLASK ---
 app = Flask(__name__)
 CORS(app)
 detector = LabelDetector()
+inspection_queue = InspectionQueue(detector)
+
+def _submit_auto_inspection(camera_name, frame):
+    job, error = inspection_queue.submit(frame, source='auto', camera=camera_name)
+    if job is None:
+        print(f"Peringatan: Inspeksi otomatis kamera '{camera_name}' dilewati: {error}")
+        return
+    detector.camera(camera_name).last_auto_job_id = job.id
+    print(f"Label stabil terdeteksi di kamera '{camera_name}', inspeksi otomatis dijadwalkan: {job.id}")
+
+for _camera in detector.cameras.values():
+    _camera.on_auto_trigger = _submit_auto_inspection
+    _camera.set_auto_inspect(AUTO_INSPECT)
+
+def _component_stats(name, component):
+    """Stats of a per-process component; with inference workers they come from the workers, which do the inspecting."""
+    if detector.pool is None:
+        return component.stats()
+    return detector.pool.component_stats(name, component)
+
+METRICS.register(Gauge("camera_capture_fps", "Capture thread frame rate over the last second.",
+                       lambda: {name: camera.stats()["capture_fps"] for name, camera in detector.cameras.items()},
+                       label_name="camera"))
+METRICS.register(Gauge("master_data_cache_entries", "Rows held in the master data cache.",
+                       lambda: _component_stats("master_data", MASTER_DATA)["entries"]))
+METRICS.register(CallbackCounter("master_data_cache_lookups_total", "Master data cache hits and misses.",
+                                 lambda: {"hit": _component_stats("master_data", MASTER_DATA)["hits"],
+                                          "miss": _component_stats("master_data", MASTER_DATA)["misses"]},
+                                 label_name="result"))
+METRICS.register(CallbackCounter("ocr_cache_lookups_total", "OCR cache hits and misses.",
+                                 lambda: {"hit": _component_stats("ocr_cache", OCR_CACHE)["hits"],
+                                          "miss": _component_stats("ocr_cache", OCR_CACHE)["misses"]},
+                                 label_name="result"))
+METRICS.register(Gauge("ocr_cache_bytes", "Approximate memory held by the OCR cache.",
+                       lambda: _component_stats("ocr_cache", OCR_CACHE)["bytes"]))
+METRICS.register(CallbackCounter("label_roi_tracker_time_saved_seconds_total",
+                                 "Estimated localization time saved by the ROI tracker.",
+                                 lambda: round(_component_stats("roi_tracker", ROI_TRACKER)["time_saved_ms"] / 1000, 3)))
+METRICS.register(Gauge("inspection_jobs_queued", "Inspection jobs waiting in the queue.",
+                       lambda: inspection_queue.stats()["queued_per_camera"], label_name="camera"))
+
+def _flag(name, default):
+    return request.args.get(name, default=default, type=lambda v: v.lower() in ("1", "true", "yes"))
+
+def _response_result(result):
+    """Apply the ?image=, ?boxes= and ?timings= response options of the current request to an inspection result."""
+    # Copy first: the same dict may still be waiting in the result store queue
+    result = dict(result)
+    if request.args.get("image", RESPONSE_IMAGE) == 'base64':
+        annotation = ANNOTATIONS.get(result.get("inspection_id"))
+        if result.get("detection_image") is None and annotation is not None:
+            result["detection_image"] = base64.b64encode(annotation.jpeg()).decode("utf-8")
+    else:
+        result.pop("detection_image", None)
+    if not _flag("boxes", RESPONSE_BOXES):
+        result.pop("annotation", None)
+    if not _flag("timings", RESPONSE_TIMINGS):
+        result.pop("timings", None)
+    return result
+
+# Camera-scoped routes exist twice: /api/camera/... (and the other legacy paths) for the default camera,
+# /api/cameras/<name>/... for any configured camera.
+def _unknown_camera(name):
+    return jsonify({"success": False, "message": f"Unknown camera: {name}"}), 404
 
-@app.route("/api/camera/init", methods=["GET"])
-def init_camera():
-    return jsonify(detector.get_camera())
+@app.route("/api/health", methods=["GET"])
+def health_route():
+    """Liveness: the server is up; also reports each startup component's state and load time."""
+    return jsonify(dict(STARTUP.snapshot(), success=True))
 
-@app.route("/api/camera/frame", methods=["GET"])
-def get_camera_frame():
-    return jsonify(detector.get_frame())
+@app.route("/api/ready", methods=["GET"])
+def ready_route():
+    """Readiness: 200 once the models are loaded and warmed up, 503 until then."""
+    state = STARTUP.snapshot()
+    return jsonify(dict(state, success=state["ready"])), 200 if state["ready"] else 503
 
-@app.route("/api/process", methods=["GET"])
-def process_image_route():
-    return jsonify(detector.process_image())
+@app.route("/api/cameras", methods=["GET"])
+def list_cameras_route():
+    return jsonify({"success": True, "cameras": [camera.stats() for camera in detector.cameras.values()]})
 
-@app.route("/api/camera/close", methods=["GET"])
-def close_camera():
-    detector.stop_thread()
-    if detector.cap and detector.cap.isOpened():
-        detector.cap.release()
-        detector.cap = None
+@app.route("/api/camera/init", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/init", methods=["GET"])
+def init_camera(name):
+    return jsonify(detector.open_camera(name))
+
+@app.route("/api/camera/frame", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/frame", methods=["GET"])
+def get_camera_frame(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    return jsonify(camera.get_frame(request.args.get("width", type=int)))
+
+@app.route("/api/camera/stream", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/stream", methods=["GET"])
+def stream_camera_frames(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    return Response(
+        stream_with_context(camera.stream_frames(request.args.get("width", type=int))),
+        mimetype="multipart/x-mixed-replace; boundary=frame",
+    )
+
+@app.route("/api/process", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/process", methods=["GET"])
+def process_image_route(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    frame = camera.snapshot_frame()
+    if frame is None:
+        return jsonify({"success": False, "message": "No frame from camera to process"})
+    # Synchronous inspections go through the shared scheduler too, ahead of queued background jobs
+    job, error = inspection_queue.submit(frame, request.args.get("detection_mode"), request.args.get("ocr_mode"),
+                                         source='api', camera=camera.name, label_mode=request.args.get("label_mode"),
+                                         priority=True)
+    if job is None:
+        return jsonify({"success": False, "message": error}), 503
+    if not job.finished.wait(JOB_SYNC_TIMEOUT):
+        inspection_queue.cancel(job.id)
+        return jsonify({"success": False, "message": f"Inspection timed out after {JOB_SYNC_TIMEOUT} s"}), 504
+    if job.state == 'failed':
+        return jsonify(job.result), 500
+    if job.state != 'done':
+        return jsonify({"success": False, "message": f"Inspection {job.state}"}), 503
+    return jsonify(_response_result(job.result))
+
+@app.route("/api/inspections/<inspection_id>/image", methods=["GET"])
+def inspection_image_route(inspection_id):
+    annotation = ANNOTATIONS.get(inspection_id)
+    if annotation is None:
+        return jsonify({"success": False, "message": "Unknown or expired inspection"}), 404
+    quality = min(100, max(1, request.args.get("quality", default=ANNOTATION_JPEG_QUALITY, type=int)))
+    scale = min(1.0, max(0.05, request.args.get("scale", default=ANNOTATION_SCALE, type=float)))
+    response = Response(annotation.jpeg(quality, scale), mimetype="image/jpeg")
+    # An inspection's image never changes: let the renderer cache it per id/quality/scale
+    response.set_etag(f"{inspection_id}-{quality}-{scale:g}")
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+@app.route("/api/results/stats", methods=["GET"])
+def result_store_stats_route():
+    if detector.result_sink is None:
+        return jsonify({"success": False, "message": "Result store is disabled"})
+    return jsonify({"success": True, "store": detector.result_sink.stats()})
+
+@app.route("/api/ocr-cache", methods=["GET"])
+def ocr_cache_stats_route():
+    return jsonify({"success": True, "cache": _component_stats("ocr_cache", OCR_CACHE)})
+
+@app.route("/api/ocr-cache", methods=["POST"])
+def ocr_cache_update_route():
+    # {"enabled": false} for auditing runs, {"clear": true} to drop cached results
+    payload = request.get_json(silent=True) or {}
+    if "enabled" in payload:
+        OCR_CACHE.enabled = bool(payload["enabled"])
+    if payload.get("clear"):
+        OCR_CACHE.clear()
+    return jsonify({"success": True, "cache": _component_stats("ocr_cache", OCR_CACHE)})
+
+@app.route("/api/roi-tracker", methods=["GET"])
+def roi_tracker_stats_route():
+    return jsonify({"success": True, "tracker": _component_stats("roi_tracker", ROI_TRACKER)})
+
+@app.route("/api/roi-tracker", methods=["POST"])
+def roi_tracker_update_route():
+    # {"enabled": false} to always search the full frame, {"reset": true} after moving a fixture
+    payload = request.get_json(silent=True) or {}
+    if "enabled" in payload:
+        ROI_TRACKER.enabled = bool(payload["enabled"])
+    if payload.get("reset"):
+        ROI_TRACKER.reset()
+    return jsonify({"success": True, "tracker": _component_stats("roi_tracker", ROI_TRACKER)})
+
+@app.route("/api/workers", methods=["GET"])
+def inference_workers_route():
+    if detector.pool is None:
+        return jsonify({"success": True, "processes": 0})
+    return jsonify(dict(detector.pool.stats(), success=True))
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_route():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/jobs", methods=["POST"], defaults={"name": None})
+@app.route("/api/cameras/<name>/jobs", methods=["POST"])
+def submit_job_route(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    payload = request.get_json(silent=True) or {}
+    frame = camera.snapshot_frame()
+    if frame is None:
+        return jsonify({"success": False, "message": "No frame from camera to process"}), 409
+    job, error = inspection_queue.submit(frame, payload.get("detection_mode"), payload.get("ocr_mode"),
+                                         camera=camera.name, label_mode=payload.get("label_mode"))
+    if job is None:
+        return jsonify({"success": False, "message": error}), 503
+    return jsonify({"success": True, "job_id": job.id, "camera": camera.name, "state": job.state}), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job_route(job_id):
+    job = inspection_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Unknown job"}), 404
+    # Long-poll: ?wait=<seconds> blocks until the job finishes or the timeout expires
+    wait = min(request.args.get("wait", default=0, type=float), JOB_MAX_WAIT)
+    if wait > 0:
+        job.finished.wait(wait)
+    response = dict(job.to_dict(), success=True)
+    if response.get("result"):
+        response["result"] = _response_result(response["result"])
+    if job.state == 'queued':
+        response["queue_position"] = inspection_queue.position(job)
+    return jsonify(response)
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def cancel_job_route(job_id):
+    job = inspection_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Unknown job"}), 404
+    return jsonify({"success": True, "job_id": job.id, "state": job.state})
+
+@app.route("/api/jobs", methods=["GET"])
+def job_queue_stats_route():
+    return jsonify(dict(inspection_queue.stats(), success=True))
+
+@app.route("/api/auto", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/auto", methods=["GET"])
+def auto_inspect_status_route(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    trigger = camera.auto_trigger
+    return jsonify({
+        "success": True,
+        "camera": camera.name,
+        "enabled": trigger is not None,
+        "last_job_id": camera.last_auto_job_id,
+        "trigger": trigger.stats() if trigger else None,
+    })
+
+@app.route("/api/auto", methods=["POST"], defaults={"name": None})
+@app.route("/api/cameras/<name>/auto", methods=["POST"])
+def auto_inspect_toggle_route(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    enabled = bool((request.get_json(silent=True) or {}).get("enabled", False))
+    camera.set_auto_inspect(enabled)
+    return jsonify({"success": True, "camera": camera.name, "enabled": enabled})
+
+@app.route("/api/camera/close", methods=["GET"], defaults={"name": None})
+@app.route("/api/cameras/<name>/close", methods=["GET"])
+def close_camera(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
+    camera.close()
     return jsonify({"success": True, "message": "Camera closed."})
 
-@app.route("/api/play/pause/frame", methods=["POST"])
-def play_pause_frame_route():
+@app.route("/api/play/pause/frame", methods=["POST"], defaults={"name": None})
+@app.route("/api/cameras/<name>/play", methods=["POST"])
+def play_pause_frame_route(name):
+    camera = detector.camera(name)
+    if camera is None:
+        return _unknown_camera(name)
     state = request.get_json().get("state", False)
-    if state: detector.start_thread()
-    else: detector.stop_thread()
+    if state: camera.start_thread()
+    else: camera.stop_thread()
     return jsonify({"success": True})
 
+@app.route("/api/masterdata/stats", methods=["GET"])
+def master_data_stats_route():
+    return jsonify({"success": True, "cache": _component_stats("master_data", MASTER_DATA)})
+
+@app.route("/api/masterdata/invalidate", methods=["POST"])
+def master_data_invalidate_route():
+    payload = request.get_json(silent=True) or {}
+    removed = MASTER_DATA.invalidate(payload.get("partcode"), payload.get("label_type"))
+    return jsonify({"success": True, "removed": removed})
+
+# --- MODE BATCH (OFFLINE) ---
+_batch_detector = None
+
+def _init_batch_worker(threads, ocr_cache=True, roi_tracking=True):
+    """Process pool initializer: every worker gets its own, warmed-up detector backend and RapidOCR engine."""
+    global _batch_detector
+    cv2.setNumThreads(1)
+    OCR_CACHE.enabled = OCR_CACHE.enabled and ocr_cache
+    ROI_TRACKER.enabled = ROI_TRACKER.enabled and roi_tracking
+    _batch_detector = LabelDetector()
+    _batch_detector.yolo_model = load_detector_backend(threads=threads)
+    warm_up(_batch_detector)
+
+def _inspect_batch_frame(source, frame_index, frame, detection_mode, ocr_mode, annotated_dir, label_mode=None):
+    if frame is None:
+        frame = cv2.imread(source)
+    if frame is None:
+        return {"source": source, "frame": frame_index, "success": False, "message": "Unreadable image"}
+    result = _batch_detector.process_image(detection_mode, ocr_mode, frame=frame, encode_image=False,
+                                           label_mode=label_mode)
+    result.pop("detection_image", None)
+    result.pop("detection_image_url", None)
+    record = dict(result, source=source, frame=frame_index)
+    annotation = ANNOTATIONS.get(result.get("inspection_id"))
+    if annotated_dir and annotation is not None:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        suffix = f"_{frame_index:06d}" if frame_index is not None else ""
+        annotated_path = os.path.join(annotated_dir, f"{stem}{suffix}_{result.get('status', 'ERROR')}.jpg")
+        with open(annotated_path, "wb") as f:
+            f.write(annotation.jpeg())
+        record["annotated_image"] = annotated_path
+    return record
+
+def iter_batch_inputs(path, frame_step=1):
+    """Yield (source, frame_index, frame) for an image directory/file or a video file.
+
+    Images are read by the workers (frame is None); video frames are decoded here.
+    """
+    video_exts = ('.mp4', '.avi', '.mkv', '.mov', '.wmv')
+    if os.path.isfile(path) and path.lower().endswith(video_exts):
+        cap = cv2.VideoCapture(path)
+        frame_index = 0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_index % frame_step == 0:
+                    yield path, frame_index, frame
+                frame_index += 1
+        finally:
+            cap.release()
+    else:
+        for image_path in list_images(path):
+            yield image_path, None, None
+
+BATCH_CSV_FIELDS = [
+    "source", "frame", "success", "status", "label_type", "label_count", "matched", "defects", "defect_items",
+    "detector_ms", "recognition_ocr_ms", "global_ocr_ms", "individual_ocr_ms", "verification_ms", "total_ms",
+    "message",
+]
+
+def _batch_csv_row(record):
+    timings = record.get("timings", {})
+    defects = record.get("defect_results", [])
+    row = {
+        "source": record["source"], "frame": record["frame"], "success": record.get("success"),
+        "status": record.get("status"), "label_type": record.get("label_type"),
+        "label_count": record.get("label_count", 1 if record.get("success") else 0),
+        "matched": len(record.get("matched_results", [])), "defects": len(defects),
+        "defect_items": ";".join(f"{d['label']}/{d['item']}:{d['reason']}" if 'label' in d else f"{d['item']}:{d['reason']}"
+                                 for d in defects),
+        "message": record.get("message", ""),
+    }
+    row.update({key: timings.get(key) for key in BATCH_CSV_FIELDS if key.endswith("_ms")})
+    return row
+
+def run_batch(input_path, output_path, workers=None, annotated_dir=None, frame_step=1,
+              detection_mode=None, ocr_mode=None, ocr_cache=True, roi_tracking=True, label_mode=None):
+    """Inspect every image/video frame under input_path on a process pool, streaming results to JSONL or CSV."""
+    import csv
+    from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    if annotated_dir:
+        os.makedirs(annotated_dir, exist_ok=True)
+
+    as_csv = output_path.lower().endswith(".csv")
+    counts = {"frames": 0, "OK": 0, "DEFECT": 0, "ERROR": 0, "failed": 0}
+    start = time.perf_counter()
+    with open(output_path, "w", newline="", encoding="utf-8") as out, \
+            ProcessPoolExecutor(workers, initializer=_init_batch_worker,
+                                initargs=(threads_per_worker, ocr_cache, roi_tracking)) as pool:
+        writer = csv.DictWriter(out, fieldnames=BATCH_CSV_FIELDS) if as_csv else None
+        if writer:
+            writer.writeheader()
+
+        def drain(futures, return_when):
+            done, pending = wait(futures, return_when=return_when)
+            for future in done:
+                record = future.result()
+                counts["frames"] += 1
+                if record.get("success"):
+                    counts[record["status"]] = counts.get(record["status"], 0) + 1
+                else:
+                    counts["failed"] += 1
+                if writer:
+                    writer.writerow(_batch_csv_row(record))
+                else:
+                    out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+            return pending
+
+        # Bound the number of in-flight frames so long videos do not pile up in memory
+        pending = set()
+        for source, frame_index, frame in iter_batch_inputs(input_path, frame_step):
+            pending.add(pool.submit(_inspect_batch_frame, source, frame_index, frame,
+                                    detection_mode, ocr_mode, annotated_dir, label_mode))
+            if len(pending) >= workers * 2:
+                pending = drain(pending, FIRST_COMPLETED)
+        if pending:
+            drain(pending, ALL_COMPLETED)
+
+    elapsed = time.perf_counter() - start
+    summary = dict(counts, workers=workers, elapsed_s=round(elapsed, 2),
+                   frames_per_s=round(counts["frames"] / elapsed, 3) if elapsed else None)
+    summary["frames_per_s_per_worker"] = round(summary["frames_per_s"] / workers, 3) if summary["frames_per_s"] else None
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Label Defect Detection backend")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Run the Flask API server (default)")
+    serve_parser.add_argument("--inference-processes", type=int, default=INFERENCE_PROCESSES,
+                              help="Run inspections in this many worker processes (0 = in the server process)")
+
+    export_parser = subparsers.add_parser("export", help="Export best.pt for the ONNX Runtime/OpenVINO backends")
+    export_parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    export_parser.add_argument("--int8", action="store_true", help="Also build the INT8-quantized model")
+    export_parser.add_argument("--calibration-dir", default=CALIBRATION_DIR)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare a detector backend against the .pt model")
+    compare_parser.add_argument("images", help="Directory of label images")
+    compare_parser.add_argument("--backend", default="onnxruntime", choices=["pytorch", "onnxruntime", "openvino"])
+    compare_parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    compare_parser.add_argument("--threads", type=int, default=DETECTOR_THREADS)
+    compare_parser.add_argument("--int8", action="store_true")
+
+    batch_parser = subparsers.add_parser("batch", help="Inspect a directory of images or a video file offline")
+    batch_parser.add_argument("input", help="Image file, image directory or video file")
+    batch_parser.add_argument("-o", "--output", default="batch_results.jsonl", help="Results file (.jsonl or .csv)")
+    batch_parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument("--annotated-dir", default=None, help="Write annotated JPEGs to this directory")
+    batch_parser.add_argument("--frame-step", type=int, default=1, help="Inspect every Nth video frame")
+    batch_parser.add_argument("--detection-mode", choices=["single", "two_pass"], default=None)
+    batch_parser.add_argument("--ocr-mode", choices=["global", "recognition"], default=None)
+    batch_parser.add_argument("--label-mode", choices=["single", "multi"], default=None,
+                              help="'multi' inspects every label in the frame")
+    batch_parser.add_argument("--no-ocr-cache", action="store_true", help="Disable the OCR result cache (audit runs)")
+    batch_parser.add_argument("--no-roi-tracking", action="store_true",
+                              help="Always localize the label in the full frame (unrelated images)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(export_detector_model(args.imgsz, args.int8, args.calibration_dir))
+    elif args.command == "compare":
+        reference = load_detector_backend('pytorch', args.imgsz, args.threads)
+        candidate = load_detector_backend(args.backend, args.imgsz, args.threads, args.int8)
+        report = compare_detector_backends(list_images(args.images), candidate, reference)
+        print(json.dumps(report, indent=2))
+    elif args.command == "batch":
+        summary = run_batch(args.input, args.output, args.workers, args.annotated_dir, args.frame_step,
+                            args.detection_mode, args.ocr_mode, not args.no_ocr_cache, not args.no_roi_tracking,
+                            args.label_mode)
+        print(json.dumps(summary, indent=2))
+    else:
+        processes = getattr(args, "inference_processes", INFERENCE_PROCESSES)
+        STARTUP.expect("sql_driver")
+        if processes > 0:
+            STARTUP.expect("inference_workers")
+            detector.pool = InferencePool(processes)
+            # Enough queue threads to keep every slot busy: one frame per worker plus the next one staged
+            inspection_queue.add_workers(max(0, len(detector.pool.slots) - JOB_WORKERS))
+        else:
+            for component in ("detector", "ocr_engine", "warmup"):
+                STARTUP.expect(component)
+        if MASTER_DATA_PREFETCH and processes == 0:
+            # With inference workers each worker prefetches for itself (see _inference_worker_main)
+            STARTUP.expect("master_data", required=False)
+        # Only the server keeps a result store; importing the module (tests, benchmark, batch) must not create one
+        if RESULT_STORE_ENABLED:
+            detector.result_sink = ResultSink().start()
+        # Bind right away; models load and warm up in the background (poll /api/ready)
+        threading.Thread(target=_start_up, args=(detector,), daemon=True).start()
+        app.run(host="0.0.0.0", port=5000, threaded=True)
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, threaded=True)
\ No newline at end of file
+    main()
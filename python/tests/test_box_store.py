@@ -0,0 +1,89 @@
+"""BoxStore must give exactly the results of the original nested-loop proximity and containment code."""
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import detector  # noqa: E402
+
+
+def reference_adjacent_pairs(boxes):
+    """The original O(n^2) proximity analysis of run_detection_and_verification."""
+    pairs = []
+    for i in range(len(boxes)):
+        for j in range(i + 1, len(boxes)):
+            x1_a, y1_a, x2_a, y2_a = boxes[i]
+            x1_b, y1_b, x2_b, y2_b = boxes[j]
+            cy_a = (y1_a + y2_a) / 2
+            cy_b = (y1_b + y2_b) / 2
+            avg_height = ((y2_a - y1_a) + (y2_b - y1_b)) / 2
+            if abs(cy_a - cy_b) < avg_height * 0.5:
+                horizontal_gap = max(x1_a, x1_b) - min(x2_a, x2_b)
+                avg_width = ((x2_a - x1_a) + (x2_b - x1_b)) / 2
+                if horizontal_gap < avg_width * 0.5:
+                    pairs.append((i, j))
+    return pairs
+
+
+def reference_assign_centers(boxes, ocr_boxes):
+    """The original per-box scan of the global OCR results."""
+    return [
+        [k for k, ocr_coords in enumerate(ocr_boxes)
+         if detector.is_point_inside_box(detector.get_box_center(ocr_coords), coords)]
+        for coords in boxes
+    ]
+
+
+def random_boxes(rng, count, width=1280, height=960):
+    boxes = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(0, width - 10), rng.uniform(0, height - 10)
+        boxes.append([x1, y1, x1 + rng.uniform(1, 300), y1 + rng.uniform(1, 80)])
+    return boxes
+
+
+def random_row_layout(rng, count):
+    """Fields on a few text rows with small gaps, so many pairs sit close to the thresholds."""
+    boxes = []
+    for _ in range(count):
+        row = rng.randrange(4)
+        x1 = rng.uniform(0, 600)
+        y1 = 40 * row + rng.uniform(-8, 8)
+        boxes.append([x1, y1, x1 + rng.uniform(20, 120), y1 + rng.uniform(15, 35)])
+    return boxes
+
+
+def random_ocr_boxes(rng, count):
+    # RapidOCR boxes come from float32 polygon points
+    return [list(np.float32(box)) for box in random_boxes(rng, count)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_adjacent_pairs_match_nested_loop(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        layout = random_row_layout if rng.random() < 0.5 else random_boxes
+        boxes = layout(rng, rng.randrange(0, 25))
+        pairs = [tuple(pair) for pair in detector.BoxStore(boxes).adjacent_pairs().tolist()]
+        assert pairs == reference_adjacent_pairs(boxes)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_assign_centers_match_point_in_box(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        boxes = random_boxes(rng, rng.randrange(0, 25))
+        ocr_boxes = random_ocr_boxes(rng, rng.randrange(0, 40))
+        assigned = [row.tolist() for row in detector.BoxStore(boxes).assign_centers(ocr_boxes)]
+        assert assigned == reference_assign_centers(boxes, ocr_boxes)
+
+
+def test_empty_inputs():
+    assert detector.BoxStore([]).adjacent_pairs().tolist() == []
+    assert detector.BoxStore([]).assign_centers([]) == []
+    assert [row.tolist() for row in detector.BoxStore([[0, 0, 10, 10]]).assign_centers([])] == [[]]
+    assert detector.BoxStore([]).assign_centers([[0, 0, 10, 10]]) == []
@@ -10,6 +10,23 @@ const os = require("os");
 let mainWindow;
 let pythonProcess = null;
 const API_URL = "http://127.0.0.1:5000/api";
+// Model load state reported to the renderer: loading -> ready | failed
+let backendStatus = { state: "loading", message: "Loading models..." };
+let backendErrorShown = false;
+
+// One dialog per start-up, whether the failure shows up on stderr or through /api/ready
+function showBackendError(message) {
+    if (backendErrorShown) return;
+    backendErrorShown = true;
+    dialog.showErrorBox("Python Error", message);
+}
+
+function setBackendStatus(status) {
+    backendStatus = status;
+    if (mainWindow && !mainWindow.isDestroyed()) {
+        mainWindow.webContents.send("backend-status", backendStatus);
+    }
+}
 
 function createWindow() {
     mainWindow = new BrowserWindow({
@@ -81,7 +98,7 @@ async function startPythonServer() {
             log.error(`Python stderr: ${errorMsg}`);
 
             if (errorMsg.includes("ModuleNotFoundError") || errorMsg.includes("ImportError")) {
-                dialog.showErrorBox("Python Error", `Library Python (backend) korup atau gagal diinstal:\n\n${errorMsg}`);
+                showBackendError(`Library Python (backend) korup atau gagal diinstal:\n\n${errorMsg}`);
                 reject(new Error(errorMsg));
             }
         });
@@ -91,15 +108,17 @@ async function startPythonServer() {
              reject(err);
         });
 
+        // The server binds immediately and loads the models in the background; the window opens as soon
+        // as /api/health answers and waitForBackendReady() follows the model load from there.
         const checkServer = async () => {
             try {
-                await axios.get(`${API_URL}/camera/frame`);
-                log.info("Python server is running");
+                await axios.get(`${API_URL}/health`);
+                log.info("Python server is up");
                 resolve();
             } catch (error) {
                 if (error.code === "ECONNREFUSED") {
                     log.info("Waiting for Python server to start...");
-                    setTimeout(checkServer, 500);
+                    setTimeout(checkServer, 250);
                 } else {
                     log.error(`Error checking server: ${error.message}`);
                     resolve(); // continue anyway
@@ -107,11 +126,42 @@ async function startPythonServer() {
             }
         };
 
-        setTimeout(checkServer, 2000);
+        setTimeout(checkServer, 250);
     });
 }
 
+// /api/ready answers 503 with the load state of each component until the first inspection can run at full speed
+async function waitForBackendReady() {
+    try {
+        const response = await axios.get(`${API_URL}/ready`);
+        log.info(`Python backend is ready (${response.data.uptime_s} s)`);
+        setBackendStatus({ state: "ready" });
+    } catch (error) {
+        const data = error.response && error.response.status === 503 ? error.response.data : null;
+        if (data && !data.failed) {
+            const components = data.components || {};
+            const loading = Object.keys(components).filter((name) => components[name].state !== "ready");
+            log.info(`Waiting for Python backend to load: ${loading.join(", ")}`);
+            setTimeout(waitForBackendReady, 250);
+        } else if (data) {
+            const components = data.components || {};
+            const detail = Object.keys(components)
+                .filter((name) => components[name].state === "failed")
+                .map((name) => `${name}: ${components[name].error}`)
+                .join("\n");
+            log.error(`Python backend failed to load: ${detail}`);
+            setBackendStatus({ state: "failed", message: detail });
+            showBackendError(`Backend gagal dimuat. Coba install ulang aplikasi:\n\n${detail}`);
+        } else {
+            log.error(`Error checking backend readiness: ${error.message}`);
+            setTimeout(waitForBackendReady, 1000);
+        }
+    }
+}
+
 function setupIpcHandlers() {
+    ipcMain.handle("get-backend-status", () => backendStatus);
+
     ipcMain.handle("init-camera", async () => {
         try {
             log.info("getting camera...");
@@ -157,10 +207,18 @@ function setupIpcHandlers() {
 
     ipcMain.handle("process-image", async () => {
         try {
-            const response = await axios.get(`${API_URL}/process`);
+            // The annotated image is fetched by the renderer straight from the backend, not passed through IPC
+            const response = await axios.get(`${API_URL}/process`, { params: { image: "url" } });
+            if (response.data.detection_image_url) {
+                response.data.detection_image_url = new URL(response.data.detection_image_url, API_URL).href;
+            }
             return response.data;
         } catch (error) {
             log.error(`Error processing image: ${error.message}`);
+            // A rejected, failed or timed-out inspection still answers with a JSON message
+            if (error.response && error.response.data && error.response.data.message) {
+                return error.response.data;
+            }
             return {
                 success: false,
                 message: `Failed to process image: ${error.message}`,
@@ -192,6 +250,7 @@ app.whenReady().then(async () => {
         await startPythonServer();
         setupIpcHandlers();
         createWindow();
+        waitForBackendReady();
 
         app.on("activate", () => {
             if (BrowserWindow.getAllWindows().length === 0) createWindow();
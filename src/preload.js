@@ -14,6 +14,10 @@ contextBridge.exposeInMainWorld("api", {
     // Image processing
     processImage: () => ipcRenderer.invoke("process-image"),
 
+    // Backend model load state: { state: "loading" | "ready" | "failed", message }
+    getBackendStatus: () => ipcRenderer.invoke("get-backend-status"),
+    onBackendStatus: (callback) => ipcRenderer.on("backend-status", (event, status) => callback(status)),
+
     // UI interactions
     showError: (options) => ipcRenderer.invoke("show-error", options),
 
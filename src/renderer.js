@@ -12,8 +12,10 @@ let frame_guide_select = document.getElementById("frame_guide_select");
 let camera_overlay_svg = document.getElementById("camera_overlay_svg");
 
 // Global variables
-let stop_camera = false;
 let is_playing = true;
+let backend_ready = false;
+// MJPEG live view served by the Python backend
+const CAMERA_STREAM_URL = "http://127.0.0.1:5000/api/camera/stream";
 
 // Event listeners
 document.addEventListener("DOMContentLoaded", init);
@@ -24,6 +26,8 @@ frame_guide_select.addEventListener("change", updateFrameGuide);
 // Initialize on page load
 async function init() {
     updateFrameGuide(); // Set initial frame state
+    window.api.onBackendStatus(showBackendStatus);
+    showBackendStatus(await window.api.getBackendStatus());
     let cameraInitialized = await initCamera();
     if (cameraInitialized) startCameraFeed();
 }
@@ -33,6 +37,20 @@ function showError(title, message) {
     window.api.showError({ title, message });
 }
 
+// The window opens while the models still load; inspections are possible once the backend is ready
+function showBackendStatus(status) {
+    backend_ready = status.state === "ready";
+    process_btn.disabled = !backend_ready;
+    if (status.state === "loading") {
+        process_btn.innerHTML = `<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Loading models...`;
+    } else if (status.state === "failed") {
+        process_btn.innerHTML = `<i class="bi bi-exclamation-triangle-fill me-2"></i>Backend Error`;
+        defect_results_txt.value = `Backend Error: ${status.message}`;
+    } else {
+        process_btn.innerHTML = `<i class="bi bi-camera-fill me-2"></i>Process`;
+    }
+}
+
 // Calculates the actual dimensions and position of an image
 function getContainedImageDimensions(img) {
     const containerWidth = img.clientWidth;
@@ -121,24 +139,24 @@ async function initCamera() {
     }
 }
 
-async function startCameraFeed() {
-    while (!stop_camera) {
-        try {
-            let result = await window.api.getFrame();
-            if (result.success == "success") {
-                live_camera_img.src = `data:image/jpeg;base64,${result.frame}`;
-            } else if (result.success == "nocamera") {
-                live_camera_img.src = "../assets/no_camera.png";
-                stop_camera = true;
-                break;
-            }
-        } catch (error) {
-            live_camera_img.src = "../assets/no_camera.png";
-            stop_camera = true;
-            showError("Camera Error", `Failed to get camera frame: ${error.message}`);
-            break;
-        }
-        await new Promise((resolve) => setTimeout(resolve, 33));
+// The backend pushes new frames into the <img> itself; nothing is polled or passed through IPC
+function startCameraFeed() {
+    if (live_camera_img.src.startsWith(CAMERA_STREAM_URL)) return; // Already streaming (resumes after pause)
+    live_camera_img.onerror = () => {
+        live_camera_img.onerror = null;
+        live_camera_img.src = "../assets/no_camera.png";
+        showError("Camera Error", "Failed to get camera frame: the live stream was interrupted.");
+    };
+    live_camera_img.src = `${CAMERA_STREAM_URL}?t=${Date.now()}`;
+    waitForStreamSize();
+}
+
+// 'load' does not fire for every part of a multipart stream; draw the guide once the size is known
+function waitForStreamSize() {
+    if (live_camera_img.naturalWidth) {
+        updateFrameGuide();
+    } else if (live_camera_img.src.startsWith(CAMERA_STREAM_URL)) {
+        requestAnimationFrame(waitForStreamSize);
     }
 }
 
@@ -151,6 +169,10 @@ function formatResults(resultsArray) {
     return resultsArray
         .map((item) => {
             let block = `Item           : ${item.item}\n`;
+            // Multi-label inspections tag every item with the label it belongs to
+            if (item.label !== undefined) {
+                block = `Label          : #${item.label}\n` + block;
+            }
             // Only add 'reason' if it's a defect
             if (item.reason) {
                 block += `Reason         : ${item.reason}\n`;
@@ -181,7 +203,7 @@ async function processImage() {
         let result = await window.api.processImage();
 
         if (result.success) {
-            processed_img.src = `data:image/jpeg;base64,${result.detection_image}`;
+            processed_img.src = result.detection_image_url || `data:image/jpeg;base64,${result.detection_image}`;
 
             // MODIFIED: Use the new formatResults function to display detailed results
             matched_results_txt.value = formatResults(result.matched_results);
@@ -202,7 +224,7 @@ async function processImage() {
         defect_results_txt.value = `Process Error: ${error.message}`;
         showError("Process Error", `Failed to process image: ${error.message}`);
     } finally {
-        process_btn.disabled = false;
+        process_btn.disabled = !backend_ready;
         process_btn.innerHTML = `<i class="bi bi-camera-fill me-2"></i>Process`;
     }
 }
@@ -213,7 +235,6 @@ async function playPauseFrame() {
         const result = await window.api.playPauseFrame({ state: is_playing });
 
         if (result.success) {
-            stop_camera = !is_playing;
             if (is_playing) {
                 startCameraFeed();
                 toggle_icon.classList.remove("bi-play-circle-fill");